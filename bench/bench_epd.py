@@ -0,0 +1,56 @@
+'''
+SPI traffic of the epaper2in9 driver measured by a recording SPI stand-in.
+
+Run from the repository root (MicroPython Unix port or CPython):
+    micropython bench/bench_epd.py
+    python bench/bench_epd.py
+
+Columns: operation, cs cycles, spi.write calls, bytes and the driver's
+own counters (transactions, bytes) of the last displayed frame.
+'''
+
+import sys
+sys.path.insert(0, '.')
+sys.path.insert(0, 'bench')
+try:
+    import framebuf
+except ImportError:
+    sys.path.insert(1, 'host')
+    import framebuf
+
+from framebuf import MONO_HLSB
+from fakehw import RecordingSPI, FakePin
+import epaper2in9
+import fb_plus
+
+
+def run(name, op):
+    spi.reset()
+    cs.falls = 0
+    op()
+    print('%-20s %6d %6d %7d   %s' % (name, cs.falls, spi.writes, spi.bytes, e.frame_stats))
+
+
+def show_full():
+    e.set_frame_memory(buf, 0, 0, 128, 296)
+    e.display_frame()
+
+
+spi = RecordingSPI()
+cs = FakePin()
+e = epaper2in9.EPD(spi, cs, FakePin(), FakePin(), FakePin())
+buf = bytearray(128 * 296 // 8)
+fb = fb_plus.fbplus(buf, 128, 296, MONO_HLSB)
+fb.setText32(20, 12, 2)
+
+print('operation              cs  writes   bytes   frame_stats')
+run('init', e.init)
+run('clear_frame_memory', lambda: e.clear_frame_memory(0xFF))
+fb.fill(1)
+run('full frame', show_full)
+e.partial_mode(20)
+run('partial (first)', lambda: e.display_partial(buf))
+for t in ('12:30', '12:31', '12:32', '12:32'):
+    fb.fill_rect(10, 100, 100, 24, 1)
+    fb.putText32(t, 10, 110, 0)
+    run('partial ' + t, lambda: e.display_partial(buf))
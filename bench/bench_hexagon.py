@@ -0,0 +1,132 @@
+'''
+Benchmark of hexagonI4: fixed-point polygon fill against the former
+sweep of 2*(b-1)+1 lines, for bold widths 1..10.
+
+Run from the repository root (CPython with the stand-ins from the host
+directory, MicroPython Unix port or board):
+    python bench/bench_hexagon.py
+    micropython bench/bench_hexagon.py
+
+Columns: bold, time of line sweep, time of poly fill, time of hline
+scanline fill (all in us per hexagon) and pixels different from the
+line sweep (sum over all test segments).
+'''
+
+import sys
+sys.path.insert(0, '.')
+try:
+    import framebuf
+except ImportError:
+    sys.path.insert(1, 'host')
+    import framebuf
+
+import math
+import time
+from framebuf import FrameBuffer, MONO_HLSB
+import fb_plus
+
+W = 128
+H = 128
+REPEAT = 4
+
+# segments of various direction, (x1, y1, x2, y2)
+SEGMENTS = (
+    (20, 64, 108, 64),
+    (64, 20, 64, 108),
+    (30, 30, 98, 98),
+    (30, 98, 98, 30),
+    (20, 50, 108, 80),
+    (50, 20, 80, 108),
+    (60, 60, 70, 64),
+    (40, 40, 40, 46),
+)
+
+try:
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+def hexagon_lines(fb, x1, y1, x2, y2, b, c):
+    # the former implementation of FrBuffExpansion.hexagonI4
+    if (b < 1):
+        return
+    fb.line(x1, y1, x2, y2, c)
+    if (b > 1):
+        dy = y2-y1
+        dx = x2-x1
+        dl = math.sqrt(dx*dx + dy*dy)
+        dx = dx/dl
+        dy = dy/dl
+        if (b % 2) == 0:
+            x1 += 0.5*dy
+            x2 += 0.5*dy
+            y1 += 0.5*dx
+            y2 += 0.5*dx
+        for i in range(1, b):
+            x1a = round(x1 + i*(dx+dy)/2)
+            x2a = round(x2 - i*(dx-dy)/2)
+            y1a = round(y1 + i*(dy-dx)/2)
+            y2a = round(y2 - i*(dy+dx)/2)
+            x1b = round(x1 + i*(dx-dy)/2)
+            x2b = round(x2 - i*(dx+dy)/2)
+            y1b = round(y1 + i*(dy+dx)/2)
+            y2b = round(y2 - i*(dy-dx)/2)
+            fb.line(x1a, y1a, x2a, y2a, c)
+            fb.line(x1b, y1b, x2b, y2b, c)
+
+
+class NoPoly(object):
+    # FrameBuffer without poly() forces the hline scanline fill
+    def __init__(self, fb):
+        self.hline = fb.hline
+        self.pixel = fb.pixel
+        self.line = fb.line
+
+
+def bitdiff(a, b):
+    n = 0
+    for i in range(len(a)):
+        x = a[i] ^ b[i]
+        while x:
+            n += x & 1
+            x >>= 1
+    return n
+
+
+def measure(draw, b):
+    t = ticks_us()
+    for _ in range(REPEAT):
+        for s in SEGMENTS:
+            draw(s[0], s[1], s[2], s[3], b, 1)
+    return ticks_diff(ticks_us(), t) // (REPEAT * len(SEGMENTS))
+
+
+def main():
+    buf_l = bytearray(W * H // 8)
+    buf_p = bytearray(W * H // 8)
+    buf_s = bytearray(W * H // 8)
+    fb_l = FrameBuffer(buf_l, W, H, MONO_HLSB)
+    fbx_p = fb_plus.fbplus(buf_p, W, H, MONO_HLSB)
+    fbx_s = fb_plus.fbplus(buf_s, W, H, MONO_HLSB)
+    fbx_s.fb = NoPoly(fbx_s.fb)
+
+    def lines(x1, y1, x2, y2, b, c):
+        hexagon_lines(fb_l, x1, y1, x2, y2, b, c)
+
+    print('bold  lines[us]  poly[us]  hline[us]  diff[px]')
+    for b in range(1, 11):
+        for buf in (buf_l, buf_p, buf_s):
+            buf[:] = bytes(len(buf))
+        t_l = measure(lines, b)
+        t_p = measure(fbx_p.hexagonI4, b)
+        t_s = measure(fbx_s.hexagonI4, b)
+        print('%4d %10d %9d %10d %9d' % (b, t_l, t_p, t_s, bitdiff(buf_l, buf_p)))
+
+
+main()
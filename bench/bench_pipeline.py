@@ -0,0 +1,73 @@
+'''
+Double buffered pipeline (epd_pipeline) against the serial render/display
+loop, with stand-in SPI and busy pin simulating the refresh time.
+
+Run from the repository root (MicroPython Unix port with _thread or CPython):
+    micropython bench/bench_pipeline.py
+    python bench/bench_pipeline.py
+'''
+
+import sys
+sys.path.insert(0, '.')
+sys.path.insert(0, 'bench')
+try:
+    import framebuf
+except ImportError:
+    sys.path.insert(1, 'host')
+    import framebuf
+
+from fakehw import EPDSPI, FakePin, FakeBusy
+from time import sleep_ms, ticks_ms, ticks_diff
+from framebuf import MONO_HLSB
+import epaper2in9
+import epd_pipeline
+import fb_plus
+
+FRAMES = 6
+REFRESH_MS = 300
+RENDER_MS = 200
+
+
+def new_epd():
+    busy = FakeBusy(REFRESH_MS)
+    e = epaper2in9.EPD(EPDSPI(busy), FakePin(), FakePin(), FakePin(), busy)
+    e.init()
+    return e
+
+
+def render(fb, i):
+    # drawing plus other work of the application
+    fb.fill(1)
+    fb.setText32(20, 12, 2)
+    fb.putText32('%05d' % i, 10, 110, 0)
+    sleep_ms(RENDER_MS)
+
+
+def serial():
+    e = new_epd()
+    buf = bytearray(128 * 296 // 8)
+    fb = fb_plus.fbplus(buf, 128, 296, MONO_HLSB)
+    t = ticks_ms()
+    for i in range(FRAMES):
+        render(fb, i)
+        e.set_frame_memory(buf, 0, 0, 128, 296)
+        e.display_frame()
+    return FRAMES * 60000 // ticks_diff(ticks_ms(), t)
+
+
+def pipeline():
+    p = epd_pipeline.EPDPipeline(new_epd())
+    for i in range(FRAMES):
+        render(p.fb, i)
+        p.swap()
+    p.wait()
+    s = p.stats()
+    p.stop()
+    return s
+
+
+print('refresh %d ms, render %d ms, %d frames' % (REFRESH_MS, RENDER_MS, FRAMES))
+print('serial:   %d frames/min' % serial())
+s = pipeline()
+print('pipeline: %d frames/min (serial estimate %d), overlap %d %%' % (s['fpm'], s['serial_fpm'], int(s['overlap'] * 100)))
+print(s)
@@ -0,0 +1,318 @@
+'''
+Benchmark and golden image regression suite of fb_plus and bmp_rd
+
+Runs on CPython (with the pure-Python stand-ins of framebuf and micropython
+from the host directory) and on the MicroPython Unix port or a board.
+Run from the repository root:
+    python bench/bench_suite.py
+    micropython bench/bench_suite.py
+    python bench/bench_suite.py --update      (store new golden CRCs)
+    micropython bench/bench_suite.py --no-viper     (without fb_viper)
+    python bench/bench_suite.py putText32     (only cases starting with the name)
+
+Columns: case, operations per second, heap allocated per operation (bytes,
+'-' where the runtime does not tell) and CRC32 of the rendered buffer
+compared with bench/golden.txt. The same golden values hold for the
+viper loops of fb_viper and for the pure-Python ones. Cases of functions
+of the original code have the CRCs of its output there, cases changed on
+purpose are in bench/golden_changed.txt with the reasons.
+'''
+
+import sys
+sys.path.insert(0, '.')
+sys.path.insert(1, 'bench')
+try:
+    import framebuf
+except ImportError:
+    sys.path.insert(1, 'host')
+    import framebuf
+
+if '--no-viper' in sys.argv:
+    # pure-Python loops also where the native emitter is available
+    sys.modules['fb_viper'] = None
+
+import gc
+import os
+import struct
+import time
+from framebuf import MONO_HLSB, RGB565
+import fb_plus
+import bmp_rd
+
+GOLDEN = 'bench/golden.txt'
+GOLDEN_CHANGED = 'bench/golden_changed.txt'
+BMP_FILE = 'bench/_suite.bmp'
+ATLAS_FILE = 'bench/_suite_atlas.py'
+MIN_TIME_US = 200000
+
+try:
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+try:
+    mem_alloc = gc.mem_alloc
+except AttributeError:
+    mem_alloc = None
+
+try:
+    from binascii import crc32
+except ImportError:
+    def crc32(data, crc=0):
+        crc ^= 0xFFFFFFFF
+        for b in data:
+            crc ^= b
+            for _ in range(8):
+                crc = (crc >> 1) ^ (0xEDB88320 & -(crc & 1))
+        return crc ^ 0xFFFFFFFF
+
+
+class NoEllipse(object):
+    # FrameBuffer without ellipse() forces the fallbacks of circle/fill_circle
+    def __init__(self, fb):
+        self.pixel = fb.pixel
+        self.vline = fb.vline
+        self.hline = fb.hline
+        self.line = fb.line
+        self.poly = fb.poly
+        self.blit = fb.blit
+
+
+def make_bmp(w, h, depth):
+    # test pattern as BMP file (bottom-up, with color table for depth <= 8)
+    stride = ((w * depth + 31) // 32) * 4
+    colors = 0 if depth == 24 else (1 << depth)
+    data = bytearray(stride * h)
+    for y in range(h):
+        o = (h - 1 - y) * stride
+        for x in range(w):
+            v = (x * 7 + y * 3 + (x * y >> 4)) & 0xFF
+            if depth == 24:
+                data[o + 3*x] = v
+                data[o + 3*x + 1] = (x * 5) & 0xFF
+                data[o + 3*x + 2] = (y * 9) & 0xFF
+            elif depth == 8:
+                data[o + x] = v
+            elif depth == 4:
+                data[o + (x >> 1)] |= (v & 15) << (4 if x % 2 == 0 else 0)
+            else:
+                data[o + (x >> 3)] |= (v & 1) << (7 - (x & 7))
+    pal = bytearray()
+    for i in range(colors):
+        pal += bytes(((i * 37) & 0xFF, (i * 91) & 0xFF, (i * 53) & 0xFF, 0))
+    off = 54 + len(pal)
+    hdr = struct.pack('<HIHHIIiiHHIIiiII', 0x4D42, off + len(data), 0, 0, off, 40,
+                      w, h, 1, depth, 0, len(data), 2835, 2835, colors, 0)
+    with open(BMP_FILE, 'wb') as f:
+        f.write(hdr)
+        f.write(pal)
+        f.write(data)
+
+
+def grid_bytes(pixels):
+    # pixels[y][x] (up to 16 bits) as bytes for CRC
+    out = bytearray()
+    for row in pixels:
+        for v in row:
+            out.append(v & 0xFF)
+            out.append((v >> 8) & 0xFF)
+    return out
+
+
+def grid_image(kind, top):
+    # test image 24x16 with values up to top: list grid, FBImage or PixelGrid
+    grid = [[(x * 2021 + y * 77) % (top + 1) for x in range(24)] for y in range(16)]
+    if kind == 'grid':
+        return grid
+    if kind == 'FBImage':
+        return fb_plus.pixels_to_image(grid)
+    image = fb_plus.PixelGrid(24, 16, 'H' if top > 0xFF else 'B')
+    for y in range(16):
+        for x in range(24):
+            image[y][x] = grid[y][x]
+    return image
+
+
+def load_atlas(height, width, bold, angle):
+    # round trip of font atlas: generated module is imported (ImportError
+    # skips the case where mkatlas cannot run)
+    import mkatlas
+    with open(ATLAS_FILE, 'w') as out:
+        mkatlas.write_module(out, 'Ab3#', [(height, width, bold, angle)], False)
+    sys.modules.pop('_suite_atlas', None)
+    return getattr(__import__('_suite_atlas'), mkatlas.font_name(height, width, bold, angle))
+
+
+def no_ellipse(f):
+    f.fb = NoEllipse(f.fb)
+
+
+def glyph_cache(f):
+    f.setText32(20, 12, 2, 30)
+    f.setGlyphCache()
+
+
+def hexagons(f, b):
+    f.hexagonI4(10, 20, 110, 60, b, 1)
+    f.hexagonI4(64, 10, 64, 118, b, 1)
+
+
+def put_text(f, state):
+    f.putText32('Ab3#', 16, 64, 1)
+
+
+def read_pixels(scale):
+    return grid_bytes(bmp_rd.BMPReader(BMP_FILE, scale).get_pixels())
+
+
+def read_framebuf(scale):
+    return bytes(bmp_rd.BMPReader(BMP_FILE, scale).get_framebuf().buf)
+
+
+# cases: (name, drawn FrameBuffer (w, h, format), preparation, drawing)
+# preparation(fx) returns state for drawing(fx, state) or None, drawing
+# returns bytes to check or None for the drawn FrameBuffer
+MONO = (128, 128, MONO_HLSB)
+COLOR = (64, 64, RGB565)
+
+CASES = []
+for p in ((10, 6, 1, 0), (20, 12, 2, 0), (20, 12, 2, 30), (40, 24, 4, 90)):
+    CASES.append(('putText32 %d,%d,%d,%d' % p, MONO, lambda f, p=p: f.setText32(*p), put_text))
+CASES.append(('putText32 20,12,2,30 cache', MONO, glyph_cache, put_text))
+CASES.append(('putText32 16,10,2,-90', MONO, lambda f: f.setText32(16, 10, 2, -90), put_text))
+CASES.append(('putTextAtlas 16,10,2,-90', MONO, lambda f: load_atlas(16, 10, 2, -90),
+              lambda f, font: f.putTextAtlas(font, 'Ab3#', 16, 64, 1)))
+for b in (1, 2, 3, 5, 8):
+    CASES.append(('hexagonI4 bold %d' % b, MONO, None, lambda f, s, b=b: hexagons(f, b)))
+for r in (5, 30):
+    CASES.append(('circle fallback r%d' % r, MONO, no_ellipse, lambda f, s, r=r: f.circle(64, 64, r, 1)))
+    CASES.append(('fill_circle fallback r%d' % r, MONO, no_ellipse, lambda f, s, r=r: f.circle(64, 64, r, 1, True)))
+CASES.append(('circle r0', MONO, None, lambda f, s: f.circle(64, 64, 0, 1)))
+CASES.append(('fill_circle r0', MONO, None, lambda f, s: f.circle(64, 64, 0, 1, True)))
+for rot in range(4):
+    for name, kind, top in (('grid', 'grid', 0xFFFF), ('FBImage', 'FBImage', 0xFFFF), ('mono', 'FBImage', 1),
+                            ('GS8', 'FBImage', 0xFF), ('PixelGrid', 'PixelGrid', 0xFFFF),
+                            ('PixelGrid GS8', 'PixelGrid', 0xFF)):
+        CASES.append(('img %s rot %d' % (name, rot), COLOR, lambda f, kind=kind, top=top: grid_image(kind, top),
+                      lambda f, image, rot=rot: f.img(20, 20, image, rot)))
+for d in (1, 4, 8, 24):
+    sc = bmp_rd.SCALE_RGB565 if d == 24 else bmp_rd.SCALE_ARGB1232
+    CASES.append(('BMPReader %dbpp get_pixels' % d, MONO, lambda f, d=d: make_bmp(40, 30, d),
+                  lambda f, s, sc=sc: read_pixels(sc)))
+    CASES.append(('BMPReader %dbpp get_framebuf' % d, MONO, lambda f, d=d: make_bmp(40, 30, d),
+                  lambda f, s, sc=sc: read_framebuf(sc)))
+for name, sc in (('ARGB1232', bmp_rd.SCALE_ARGB1232), ('BW', bmp_rd.SCALE_BW)):
+    CASES.append(('BMPReader 24bpp %s get_pixels' % name, MONO, lambda f: make_bmp(40, 30, 24),
+                  lambda f, s, sc=sc: read_pixels(sc)))
+    CASES.append(('BMPReader 24bpp %s get_framebuf' % name, MONO, lambda f: make_bmp(40, 30, 24),
+                  lambda f, s, sc=sc: read_framebuf(sc)))
+
+
+def run_case(size, prepare, draw):
+    buf = bytearray(fb_plus._buf_size(*size))
+    f = fb_plus.fbplus(buf, *size)
+    try:
+        state = prepare(f) if prepare else None
+    except ImportError:
+        # tool of the case is not available here
+        return None
+
+    def op():
+        return draw(f, state)
+    data = op()
+    if not isinstance(data, (bytes, bytearray)):
+        data = buf
+    crc = crc32(bytes(data)) & 0xFFFFFFFF
+    # repeat until the minimal time
+    n = 0
+    gc.collect()
+    m = mem_alloc() if mem_alloc else 0
+    t = ticks_us()
+    while True:
+        op()
+        n += 1
+        dt = ticks_diff(ticks_us(), t)
+        if dt >= MIN_TIME_US:
+            break
+    alloc = (mem_alloc() - m) // n if mem_alloc else None
+    return n * 1000000 // max(dt, 1), alloc, crc
+
+
+def load_golden(path):
+    golden = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    crc, name = line.split(' ', 1)
+                    golden[name] = int(crc, 16)
+    except OSError:
+        pass
+    return golden
+
+
+def main(argv):
+    update = '--update' in argv
+    names = [a for a in argv if not a.startswith('--')]
+    golden = load_golden(GOLDEN)
+    changed = load_golden(GOLDEN_CHANGED)
+    golden.update(changed)
+    failed = 0
+    print('fb_viper', 'used' if sys.modules.get('fb_viper') else 'not used')
+    print('%-34s %10s %10s  %s' % ('case', 'ops/s', 'alloc/op', 'crc'))
+    for name, size, prepare, draw in CASES:
+        if names and not [n for n in names if name.startswith(n)]:
+            continue
+        r = run_case(size, prepare, draw)
+        if r is None:
+            print('%-34s %10s' % (name, 'skipped'))
+            continue
+        ops, alloc, crc = r
+        if update:
+            golden[name] = crc
+            status = 'stored'
+        elif name not in golden:
+            status = 'no golden'
+        elif golden[name] == crc:
+            status = 'ok'
+        else:
+            status = 'FAILED'
+            failed += 1
+        print('%-34s %10d %10s  %08x %s' % (name, ops, '-' if alloc is None else alloc, crc, status))
+    for name in (BMP_FILE, ATLAS_FILE):
+        try:
+            os.remove(name)
+        except OSError:
+            pass
+    if update:
+        with open(GOLDEN, 'w') as f:
+            f.write('# CRC32 of rendered buffers, bench/bench_suite.py --update\n')
+            f.write('# the same as of the original code (5848826), see golden_changed.txt\n')
+            for case in CASES:
+                name = case[0]
+                if name in golden and name not in changed:
+                    f.write('%08x %s\n' % (golden[name], name))
+        # changed cases keep their place and the comments with reasons
+        lines = []
+        with open(GOLDEN_CHANGED) as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if line and not line.startswith('#'):
+                    name = line.split(' ', 1)[1]
+                    line = '%08x %s' % (golden[name], name)
+                lines.append(line)
+        with open(GOLDEN_CHANGED, 'w') as f:
+            for line in lines:
+                f.write(line + '\n')
+    if failed:
+        print('%d cases differ from golden images' % failed)
+    return 1 if failed else 0
+
+
+sys.exit(main(sys.argv[1:]))
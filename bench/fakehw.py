@@ -0,0 +1,97 @@
+'''
+Stand-ins of machine.SPI and machine.Pin recording the traffic, to run
+display drivers without the hardware (MicroPython Unix port, board or
+CPython with the stand-ins of the host directory).
+'''
+
+import time
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    # CPython, drivers import these from time as well
+    def ticks_ms():
+        return int(time.perf_counter() * 1000)
+
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+    time.ticks_ms = ticks_ms
+    time.ticks_us = ticks_us
+    time.ticks_diff = ticks_diff
+    time.sleep_ms = sleep_ms
+
+
+class RecordingSPI(object):
+    # counts write() calls and bytes, with log=True keeps copies of the data
+    def __init__(self, log=False):
+        self.log = [] if log else None
+        self.reset()
+
+    def reset(self):
+        self.writes = 0
+        self.bytes = 0
+        if self.log is not None:
+            self.log = []
+
+    def write(self, buf):
+        self.writes += 1
+        self.bytes += len(buf)
+        if self.log is not None:
+            self.log.append(bytes(buf))
+
+
+class FakePin(object):
+    # output pin counting falling edges (cs cycles), input pin is always 0 (idle)
+    OUT = 1
+    IN = 0
+
+    def __init__(self, value=0):
+        self._value = value
+        self.falls = 0
+
+    def init(self, mode=-1, value=None, **kwargs):
+        if value is not None:
+            self._value = value
+
+    def __call__(self, value=None):
+        if value is None:
+            return self._value
+        if self._value and not value:
+            self.falls += 1
+        self._value = value
+
+    def value(self, value=None):
+        return self(value)
+
+
+class FakeBusy(FakePin):
+    # busy pin of a display, busy (1) for refresh_ms after set_busy()
+    def __init__(self, refresh_ms=0):
+        super().__init__(0)
+        self.refresh_ms = refresh_ms
+        self._until = None
+
+    def set_busy(self):
+        self._until = ticks_ms() + self.refresh_ms
+
+    def value(self, value=None):
+        if self._until is not None and ticks_diff(self._until, ticks_ms()) > 0:
+            return 1
+        return 0
+
+
+class EPDSPI(RecordingSPI):
+    # RecordingSPI of e-paper controller, MASTER_ACTIVATION command starts the refresh
+    def __init__(self, busy, log=False):
+        super().__init__(log)
+        self.busy = busy
+
+    def write(self, buf):
+        super().write(buf)
+        if len(buf) == 1 and buf[0] == 0x20:
+            self.busy.set_busy()
@@ -0,0 +1,262 @@
+'''
+Behaviour tests of fb_plus and its helpers on the host
+
+Plain asserts with the pure-Python stand-ins of the host directory, run
+from the repository root:
+    python bench/test_host.py
+    python -m pytest -q bench/test_host.py
+'''
+
+import sys
+sys.path.insert(0, '.')
+sys.path.insert(1, 'bench')
+try:
+    import framebuf
+except ImportError:
+    sys.path.insert(1, 'host')
+    import framebuf
+
+from framebuf import FrameBuffer, MONO_HLSB
+# time functions of MicroPython on CPython
+import fakehw
+import fb_plus
+
+
+def new_fx(w=128, h=64, format=MONO_HLSB):
+    return fb_plus.fbplus(bytearray(fb_plus._buf_size(w, h, format)), w, h, format)
+
+
+def lit(fx):
+    # coordinates of all pixels set in the drawn FrameBuffer
+    return [(x, y) for y in range(fx.fb_height) for x in range(fx.fb_width) if fx.fb.pixel(x, y)]
+
+
+def test_text32_direct_parameters():
+    # assigned attributes give the same text as setText32, also from cache
+    ref = new_fx()
+    ref.setText32(20, 12, 3, 0)
+    ref.putText32('A8', 20, 30, 1)
+    for cache in (False, True):
+        fx = new_fx()
+        if cache:
+            fx.setGlyphCache()
+        fx.putText32('A8', 20, 30, 1)
+        fx.fill(0)
+        fx.height = 20
+        fx.width = 12
+        fx.bold = 3
+        fx.shift = 2*12 + 3 + 1
+        fx.putText32('A8', 20, 30, 1)
+        assert fx.fb.buf == ref.fb.buf
+        assert fx.measureText32('A8') == ref.measureText32('A8')
+
+
+def test_text32_align():
+    # right aligned line ends at the right edge of the box, centred line
+    # leaves the same space on both sides
+    for p in ((20, 12, 2, 0), (20, 12, 3, 0), (10, 6, 1, 0)):
+        for width in (100, 117):
+            for align in (fb_plus.ALIGN_RIGHT, fb_plus.ALIGN_CENTER):
+                fx = new_fx()
+                fx.setText32(*p)
+                x = 10 + p[1] + p[2]//2
+                fx.drawText32('M8\n8', x, 24, 1, width=width, align=align)
+                left = x - p[1] - p[2]//2
+                right = left + width - 1
+                xs = [q[0] for q in lit(fx)]
+                if align == fb_plus.ALIGN_RIGHT:
+                    assert max(xs) == right
+                else:
+                    assert abs((min(xs) - left) - (right - max(xs))) <= 1
+
+
+def test_dlist_scroll_and_reads():
+    import fb_dlist
+    fx = new_fx()
+    fx.fill_rect(4, 4, 8, 8, 1)
+    dl = fb_dlist.DisplayList()
+    dl.start(fx, draw=False)
+    fx.line(0, 0, 40, 20, 1)
+    fx.scroll(3, 2)
+    assert fx.pixel(5, 5) == 1
+    assert fx.pixel(x=40, y=20) == 0
+    dl.stop()
+    # setText32, line and scroll, reads are not recorded
+    assert [dl.op(i)[0] for i in range(len(dl))] == ['setText32', 'line', 'scroll']
+    ref = new_fx()
+    ref.fill_rect(4, 4, 8, 8, 1)
+    ref.line(0, 0, 40, 20, 1)
+    ref.scroll(3, 2)
+    dl.replay(fx)
+    assert fx.fb.buf == ref.fb.buf
+
+
+def test_pipeline_buffers_and_error():
+    from fakehw import EPDSPI, FakePin, FakeBusy
+    import epaper2in9
+    import epd_pipeline
+
+    class FailingSPI(EPDSPI):
+        # the next transfer of frame data fails
+        fail = False
+
+        def write(self, buf):
+            if self.fail and len(buf) > 1:
+                self.fail = False
+                raise OSError(5)
+            super().write(buf)
+
+    busy = FakeBusy()
+    spi = FailingSPI(busy, log=True)
+    e = epaper2in9.EPD(spi, FakePin(), FakePin(), FakePin(), busy)
+    size = e.width * e.height // 8
+    pipe = epd_pipeline.EPDPipeline(e)
+    try:
+        sent = []
+        for i in range(3):
+            buf = pipe.buf
+            pipe.fb.fill(i & 1)
+            pipe.fb.pixel(i, 0, (i & 1) ^ 1)
+            sent.append(bytes(buf))
+            assert pipe.swap(copy=False)
+            # drawing continues in the other buffer
+            assert pipe.buf is not buf
+        pipe.wait()
+        assert [d for d in spi.log if len(d) == size] == sent
+        assert pipe.frames == 3
+        # error of the worker is raised by the next swap, only once
+        spi.fail = True
+        assert pipe.swap()
+        pipe.wait()
+        try:
+            pipe.swap()
+            raise AssertionError('error of the worker not raised')
+        except OSError:
+            pass
+        assert pipe.error is None
+        spi.log = []
+        frame = bytes(pipe.buf)
+        assert pipe.swap()
+        pipe.wait()
+        assert [d for d in spi.log if len(d) == size] == [frame]
+    finally:
+        pipe.stop()
+
+
+def test_blit_sources():
+    # FrameBuffer, wrapper and profiled wrapper as source give the same pixels
+    import fb_prof
+    src = new_fx(16, 8)
+    src.rect(0, 0, 16, 8, 1)
+    src.line(0, 0, 15, 7, 1)
+    ref = new_fx()
+    ref.blit(src.fb, 5, 3)
+    for profiled in (False, True):
+        fx = new_fx()
+        if profiled:
+            prof = fb_prof.Profiler()
+            prof.attach(src)
+        fx.blit(src, 5, 3)
+        if profiled:
+            prof.detach()
+        assert fx.fb.buf == ref.fb.buf
+
+
+def rotated(x, y, w, h, rotation):
+    # position of pixel x, y of w x h image after rotation
+    if rotation == fb_plus.ROT_90_DEG:
+        return h - 1 - y, x
+    if rotation == fb_plus.ROT_180_DEG:
+        return w - 1 - x, h - 1 - y
+    return y, w - 1 - x
+
+
+def test_rotation_loops():
+    # _rotate_mono and _rotate_bytes (pure-Python or fb_viper) against
+    # rotation pixel by pixel
+    from framebuf import GS8, RGB565
+    for format, e in ((MONO_HLSB, 0), (GS8, 1), (RGB565, 2)):
+        for w, h in ((13, 9), (16, 8), (24, 17), (7, 20)):
+            src = FrameBuffer(bytearray(fb_plus._buf_size(w, h, format)), w, h, format)
+            for y in range(h):
+                for x in range(w):
+                    src.pixel(x, y, (x * 2021 + y * 77 + x * y) & (1 if e == 0 else 0xFFFF if e == 2 else 0xFF))
+            for rotation in (fb_plus.ROT_90_DEG, fb_plus.ROT_180_DEG, fb_plus.ROT_270_DEG):
+                dw, dh = (w, h) if rotation == fb_plus.ROT_180_DEG else (h, w)
+                dst = bytearray(fb_plus._buf_size(dw, dh, format))
+                if e == 0:
+                    fb_plus._rotate_mono(src.buf, (w + 7) >> 3, w, h, dst, (dw + 7) >> 3, rotation)
+                else:
+                    fb_plus._rotate_bytes(src.buf, w * e, w, h, dst, dw * e, e, rotation)
+                out = FrameBuffer(dst, dw, dh, format)
+                for y in range(h):
+                    for x in range(w):
+                        assert out.pixel(*rotated(x, y, w, h, rotation)) == src.pixel(x, y)
+
+
+def test_bmp_index_loops():
+    # _index_*bpp (pure-Python or fb_viper) against pixels of FrameBuffer
+    # with the same layout of rows
+    from array import array
+    from framebuf import GS8, GS4_HMSB
+    import bmp_rd
+    ct = array('H', [(i * 2749) & 0xFFFF for i in range(256)])
+    for index, format, bits in ((bmp_rd._index_8bpp, GS8, 8), (bmp_rd._index_4bpp, GS4_HMSB, 4),
+                                (bmp_rd._index_1bpp, MONO_HLSB, 1)):
+        raw = bytearray((i * 113 + 7) & 0xFF for i in range(40 * bits // 8))
+        fb = FrameBuffer(raw, 40, 1, format)
+        for x, w in ((0, 40), (3, 17), (8, 8), (11, 29)):
+            row = [None] * w
+            index(raw, row, ct, x, w)
+            assert row == [ct[fb.pixel(x + i, 0)] for i in range(w)]
+
+
+def test_mpy_current():
+    # fb_plus.mpy and bmp_rd.mpy are built from the current sources (where
+    # mpy_cross of the same .mpy version is installed, see mpy.bat)
+    try:
+        import subprocess
+        import tempfile
+        import os
+    except ImportError:
+        return
+    for name in ('fb_plus', 'bmp_rd'):
+        with open(name + '.mpy', 'rb') as f:
+            mpy = f.read()
+        out = os.path.join(tempfile.mkdtemp(), name + '.mpy')
+        if subprocess.call([sys.executable, '-m', 'mpy_cross', '-o', out, name + '.py'],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL):
+            # mpy_cross not installed
+            return
+        with open(out, 'rb') as f:
+            new = f.read()
+        if new[:2] != mpy[:2]:
+            # other .mpy version
+            return
+        assert new == mpy, name + '.mpy is older than ' + name + '.py, run mpy.bat'
+
+
+def test_atlas_names():
+    # fonts differing only by gap get their own constants
+    try:
+        import mkatlas
+        from io import StringIO
+    except ImportError:
+        # host tool, CPython only
+        return
+    out = StringIO()
+    mkatlas.write_module(out, '12', [(20, 12, 2, 0), (20, 12, 2, 0, 3), (16, 10, 2, -90)], False)
+    names = {}
+    exec(out.getvalue(), names)
+    assert names['FONT_20_12_2_0'][1] == 2*12 + 2 + 1
+    assert names['FONT_20_12_2_0_g3'][1] == 2*12 + 2 + 3
+    assert 'FONT_16_10_2_m90' in names
+
+
+if __name__ == '__main__':
+    n = 0
+    for name in sorted(globals()):
+        if name.startswith('test_'):
+            globals()[name]()
+            n += 1
+    print('%d tests passed' % n)
@@ -6,6 +6,8 @@ from Stuartm2. See https://github.com/stuartm2/CircuitPython_BMP_Reader
 '''
 
 from micropython import const
+from array import array
+import struct
 
 SCALE_NONE = const(0)
 SCALE_RGB565 = const(1)
@@ -14,6 +16,88 @@ SCALE_BW = const(3)
 SCALE_USER = const(4)
 
 
+# per-channel tables of conversions, created with the first use
+_luts = {}
+
+def _tables(scale):
+    """
+    Lookup tables (red, green, blue) of scale, color code is the OR of
+    table values. Tables of SCALE_ARGB1232 have 512 entries, the upper half
+    is used when any channel is above 127 (alpha bit set, channels halved).
+    """
+    t = _luts.get(scale)
+    if t is None:
+        if scale == SCALE_RGB565:
+            t = (array('H', bytes(512)), array('H', bytes(512)), array('H', bytes(512)))
+            for v in range(256):
+                t[0][v] = (v >> 3) << 11
+                t[1][v] = (v >> 2) << 5
+                t[2][v] = v >> 3
+        else:
+            t = (bytearray(512), bytearray(512), bytearray(512))
+            for v in range(256):
+                # 7-bit numbers
+                t[0][v] = (v >> 5) << 5
+                t[1][v] = (v >> 4) << 2
+                t[2][v] = v >> 5
+                t[0][256 + v] = 0x80 | ((v >> 6) << 5)
+                t[1][256 + v] = (v >> 5) << 2
+                t[2][256 + v] = v >> 6
+        _luts[scale] = t
+    return t
+
+def _converter(scale, ucf=None):
+    """
+    Function conv(raw, ob, row, w) converting w pixels of raw B,G,R bytes
+    from position ob to color codes of scale in row, None for unknown scale.
+    Colors of user convert function ucf are remembered for each distinct color.
+    """
+    if scale == SCALE_NONE:
+        def conv(raw, ob, row, w):
+            for idx in range(w):
+                row[idx] = (raw[ob+2], raw[ob+1], raw[ob])
+                ob += 3
+    elif scale == SCALE_RGB565:
+        rt, gt, bt = _tables(scale)
+        def conv(raw, ob, row, w):
+            for idx in range(w):
+                row[idx] = rt[raw[ob+2]] | gt[raw[ob+1]] | bt[raw[ob]]
+                ob += 3
+    elif scale == SCALE_ARGB1232:
+        rt, gt, bt = _tables(scale)
+        def conv(raw, ob, row, w):
+            for idx in range(w):
+                b = raw[ob]
+                g = raw[ob+1]
+                r = raw[ob+2]
+                # upper half of tables if any channel is above 127
+                k = ((r | g | b) & 0x80) << 1
+                row[idx] = rt[k | r] | gt[k | g] | bt[k | b]
+                ob += 3
+    elif scale == SCALE_BW:
+        def conv(raw, ob, row, w):
+            for idx in range(w):
+                row[idx] = (raw[ob] | raw[ob+1] | raw[ob+2]) >> 7
+                ob += 3
+    elif scale == SCALE_USER:
+        memo = {}
+        def conv(raw, ob, row, w):
+            for idx in range(w):
+                key = raw[ob] | (raw[ob+1] << 8) | (raw[ob+2] << 16)
+                c = memo.get(key)
+                if c is None:
+                    try:
+                        c = ucf(raw[ob+2], raw[ob+1], raw[ob])
+                    except:
+                        print('Invalid "user convert function".')
+                        c = (raw[ob+2], raw[ob+1], raw[ob])
+                    memo[key] = c
+                row[idx] = c
+                ob += 3
+    else:
+        return None
+    return conv
+
 def downscale(scale, ct, ucf=None):
     """
     Converting list of RGB colors to list of 16-bit or 8-bit color codes
@@ -31,45 +115,44 @@ def downscale(scale, ct, ucf=None):
         return
     if ct==[]:
         return
-    rd=0
-    gr=0
-    bl=0
-    a=0
+    conv = _converter(scale, ucf)
+    if conv is None:
+        return
+    raw = bytearray(3*len(ct))
     for idx in range(len(ct)):
-        rd=ct[idx][0]
-        gr=ct[idx][1]
-        bl=ct[idx][2]
-        if scale==SCALE_RGB565:
-            rd//=8
-            gr//=4
-            bl//=8
-            ct[idx]=(rd<<11)|(gr<<5)|bl
-        elif scale==SCALE_ARGB1232:
-            a=0
-            if (rd>127)|(gr>127)|(bl>127):
-                a=1
-                rd//=2
-                gr//=2
-                bl//=2
-            # 7-bit numbers
-            rd//=32
-            gr//=16
-            bl//=32
-            ct[idx]=(a<<7)|(rd<<5)|(gr<<2)|bl
-        elif scale==SCALE_BW:
-            if (rd>127)|(gr>127)|(bl>127):
-                ct[idx]=1
-            else:
-                ct[idx]=0
-        elif scale==SCALE_USER:
-            try:
-                ct[idx]=ucf(rd,gr,bl)
-            except:
-                print('Invalid "user convert function".')
+        raw[3*idx] = ct[idx][2]
+        raw[3*idx+1] = ct[idx][1]
+        raw[3*idx+2] = ct[idx][0]
+    conv(raw, 0, ct, len(ct))
+
+
+def _index_8bpp(raw, row, ct, x, w):
+    # 1 pixel per byte, colors by color table ct
+    for idx in range(w):
+        row[idx] = ct[raw[x]]
+        x += 1
+
+def _index_4bpp(raw, row, ct, x, w):
+    # 2 pixels per byte, the first one in upper nibble
+    for idx in range(w):
+        if x & 1:
+            row[idx] = ct[raw[x>>1] & 0x0F]
         else:
-            pass
-    return
+            row[idx] = ct[raw[x>>1] >> 4]
+        x += 1
+
+def _index_1bpp(raw, row, ct, x, w):
+    # 8 pixels per byte, the first one in MSB
+    for idx in range(w):
+        row[idx] = ct[(raw[x>>3] >> (7 - (x & 7))) & 1]
+        x += 1
 
+try:
+    # viper variants (native code emitter only)
+    from fb_viper import index_8bpp as _index_8bpp, index_4bpp as _index_4bpp, index_1bpp as _index_1bpp
+except:
+    # CPython or port without viper
+    pass
 
 
 class BMPReader(object):
@@ -82,14 +165,21 @@ class BMPReader(object):
 
     Any pixel is accessible by its location (x,y):
     pix = pixels[y][x]
+
+    With stream=True only the header and the color table are read.
+    Rows are then decoded one by one from the file:
+
+    for row in BMPReader(filename, SCALE_BW, stream=True).rows():
+        ...
     """
-    def __init__(self, filename, scale=SCALE_NONE, user_convert=None):
+    def __init__(self, filename, scale=SCALE_NONE, user_convert=None, stream=False):
         self._filename = filename
         self.scale = scale
         self._user_convert = user_convert
         if user_convert != None:
             self.scale = SCALE_USER
-        self._read_img_data()
+        self._pixel_data = None
+        self._read_img_data(stream)
 
     def __repr__(self) -> str:
         rv='"'+self._filename+'", '
@@ -97,112 +187,106 @@ class BMPReader(object):
         rv+='[' + str(self.width) + ' x ' + str(self.height) + '], '
         rv+=str(self.depth) + 'bpp'
         return rv
-    
-    def _get_pixels_24bpp(self, pixel_data):
-        pixel_grid = []
-        for _ in range(self.width): # x
-            col = []
-            for _ in range(self.height): # y
-                r = pixel_data.pop()
-                g = pixel_data.pop()
-                b = pixel_data.pop()
-                col.append((r, g, b))
-            if self.scale!=SCALE_NONE:
-                downscale(self.scale, col)
-            col.reverse()
-            pixel_grid.append(col)
-        return pixel_grid
-
-    def _get_empty_grid(self):
-        pixel_grid = []
-        for _ in range(self.height):
-            pixel_grid.append(list(range(self.width)))
-        return pixel_grid
-
-    def _get_pixels_8bpp(self, pixel_data):
-        # create empty grid first
-        pixel_grid = self._get_empty_grid()
-        # variables alocation
-        y=self.height
-        x=0
-        ob=0
-        pct=0
-        # 1 pixel per byte
-        for _ in range(self.height):
-            y-=1
-            x=0
-            pct=0
-            while x<self.width:
-                ob=pixel_data.pop(0)
-                pct+=1
-                # pixel n
-                pixel_grid[y][x]=self._color_table[ob]
-                x+=1
-            # flush padding
-            while pct%4!=0:
-                ob=pixel_data.pop(0)
-                pct+=1
-        return pixel_grid
-
-    def _get_pixels_4bpp(self, pixel_data):
-        # create empty grid first
-        pixel_grid = self._get_empty_grid()
-        # variables alocation
-        y=self.height
-        x=0
-        ob=0
-        pct=0
-        # 2 pixels per byte
-        c_code=0
-        for _ in range(self.height):
-            y-=1
-            x=0
-            pct=0
-            while x<self.width:
-                ob=pixel_data.pop(0)
-                pct+=1
-                # pixel n
-                c_code=(ob&0xF0)>>4
-                pixel_grid[y][x]=self._color_table[c_code]
-                x+=1
-                if x>=self.width: break
-                # pixel n+1
-                c_code=ob&0x0F
-                pixel_grid[y][x]=self._color_table[c_code]
-                x+=1
-            # flush padding
-            while pct%4!=0:
-                ob=pixel_data.pop(0)
-                pct+=1
-        return pixel_grid
-
-    def _get_pixels_1bpp(self, pixel_data):
-        # create empty grid first
-        pixel_grid = self._get_empty_grid()
-        # variables alocation
-        y=self.height
-        x=0
-        ob=0
-        pct=0
-        # 8 pixels per byte
-        for _ in range(self.height):
-            y-=1
-            x=0
-            pct=0
-            while x<self.width:
-                ob=pixel_data.pop(0)
-                pct+=1
-                for _ in range(8):
-                    pixel_grid[y][x]=self._color_table[1 if (ob&0x80)!=0 else 0]
-                    x+=1
-                    ob<<=1
-                    if x>=self.width: break
-            # flush padding
-            while pct%4!=0:
-                ob=pixel_data.pop(0)
-                pct+=1
-        return pixel_grid
 
+    def _decode_24bpp(self, raw, row, x, w):
+        # 3 bytes per pixel (B,G,R), converted by tables
+        self._convert(raw, 3*x, row, w)
+
+    def _decode_8bpp(self, raw, row, x, w):
+        _index_8bpp(raw, row, self._color_table, x, w)
+
+    def _decode_4bpp(self, raw, row, x, w):
+        _index_4bpp(raw, row, self._color_table, x, w)
+
+    def _decode_1bpp(self, raw, row, x, w):
+        _index_1bpp(raw, row, self._color_table, x, w)
+
+    def _row_pos(self, y):
+        # position of row y (from the top) in the pixel data
+        if self._top_down:
+            return y * self._stride
+        return (self.height - 1 - y) * self._stride
+
+    def _open(self):
+        # file is needed only in streaming mode
+        if self._pixel_data is None:
+            return open(self._filename, 'rb')
+        return None
+
+    def _read_row(self, f, y, raw, ofs=0):
+        # copy raw data of row y (from the top) from byte ofs to the buffer
+        pos = self._row_pos(y) + ofs
+        if f is None:
+            raw[:] = self._pixel_data[pos:pos+len(raw)]
+        else:
+            f.seek(self._offset + pos)
+            f.readinto(raw)
+
+    def _window(self, x, y, w, h):
+        # intersection of the window with the image
+        if w is None:
+            w = self.width - x
+        if h is None:
+            h = self.height - y
+        if x < 0:
+            w += x
+            x = 0
+        if y < 0:
+            h += y
+            y = 0
+        w = max(0, min(w, self.width - x))
+        h = max(0, min(h, self.height - y))
+        return x, y, w, h
+
+    def rows(self, x=0, y=0, w=None, h=None):
+        """
+        Generator of decoded rows from the top of picture, optionally only
+        of the window (x, y, w, h). The same row list is reused for all rows,
+        so copy it if you need to keep it. Only the bytes of the window
+        are read from the file, one row at a time.
+        """
+        x, y, w, h = self._window(x, y, w, h)
+        return self._rows(x, y, w, h, None)
+
+    def _rows(self, x, y, w, h, grid):
+        # rows are decoded into one list, or into rows of grid
+        if w == 0:
+            return
+        row = [0] * w
+        # bytes of the row covering the window
+        ofs = (x * self.depth) // 8
+        raw = bytearray(((x + w) * self.depth + 7) // 8 - ofs)
+        x -= ofs * 8 // self.depth
+        f = self._open()
+        try:
+            for i in range(h):
+                if grid is not None:
+                    row = grid[i]
+                self._read_row(f, y + i, raw, ofs)
+                self._decode(raw, row, x, w)
+                yield row
+        finally:
+            if f is not None:
+                f.close()
+
+    def _typecode(self):
+        # type of PixelGrid for colors of the image, None if they are not 8 or 16 bit numbers
+        if self.depth == 24:
+            if self.scale == SCALE_RGB565:
+                return 'H'
+            if self.scale == SCALE_ARGB1232 or self.scale == SCALE_BW:
+                return 'B'
+            return None
+        top = 0
+        for c in self._color_table:
+            if not isinstance(c, int) or c < 0:
+                return None
+            top = max(top, c)
+        if top <= 0xFF:
+            return 'B'
+        if top <= 0xFFFF:
+            return 'H'
+        return None
 
     def get_pixels(self):
         """
@@ -212,67 +296,240 @@ class BMPReader(object):
 
         pixels = BMPReader(filename).get_pixels()
         pixel = pixels[y][x]
+
+        Colors converted to 8 or 16 bit numbers are returned in fb_plus.PixelGrid
+        (one buffer, 1 or 2 bytes per pixel), others in list of lists.
         """
-        pixel_data = list(self._pixel_data) # So we're working on a copy
+        return self.get_region(0, 0, self.width, self.height)
 
-        if self.depth == 24:
-            return self._get_pixels_24bpp(pixel_data)
-        elif self.depth==1:
-            return self._get_pixels_1bpp(pixel_data)
-        elif self.depth==4:
-            return self._get_pixels_4bpp(pixel_data)
-        elif self.depth==8:
-            return self._get_pixels_8bpp(pixel_data)
-        return []
-
-    def _read_img_data(self):
-        def lebytes_to_int(bytes):
-            n = 0x00
-            while len(bytes) > 0:
-                n <<= 8
-                n |= bytes.pop()
-            return int(n)
+    def get_region(self, x, y, w, h):
+        """
+        Returns only the window (x, y, w, h) of image as pixels[y][x],
+        pixels[0][0] is the pixel (x, y) of image. Only the rows and columns
+        of the window are decoded, also in streaming mode.
+        """
+        x, y, w, h = self._window(x, y, w, h)
+        typecode = self._typecode()
+        if w == 0 or h == 0 or typecode is None:
+            pixel_grid = []
+            for row in self._rows(x, y, w, h, None):
+                pixel_grid.append(list(row))
+            return pixel_grid
+        from fb_plus import PixelGrid
+        grid = PixelGrid(w, h, typecode)
+        for row in self._rows(x, y, w, h, grid):
+            pass
+        return grid
 
-        with open(self._filename, 'rb') as f:
-            img_bytes = list(bytearray(f.read()))
-
-        # Before we proceed, we need to ensure certain conditions are met
-        assert img_bytes[0:2] == [66, 77], "Not a valid BMP file"
-        assert lebytes_to_int(img_bytes[30:34]) == 0, \
-            "Compression is not supported"
-        self.depth = lebytes_to_int(img_bytes[28:30])
-        colors = lebytes_to_int(img_bytes[0x2E:0x31])
-        # print('colors='+str(colors)+', depth='+str(self.depth))
+    def get_framebuf(self, x=0, y=0, w=None, h=None):
+        """
+        Returns the image (or its window x, y, w, h) as fb_plus.FBImage
+        ready for FrameBuffer.blit().
+        1, 4 and 8bpp rows are copied as they are (MONO_HLSB, GS4_HMSB, GS8)
+        and the color table becomes the palette. 24bpp pixels are converted
+        to MONO_HLSB (SCALE_BW), GS8 (SCALE_ARGB1232) or RGB565.
+        Colors have to be converted to numbers (scale other than SCALE_NONE).
+        """
+        from fb_plus import FBImage
+        from framebuf import FrameBuffer, MONO_HLSB, GS4_HMSB, GS8, RGB565
+        assert self.scale != SCALE_NONE, "Conversion of colors is required"
+        x, y, w, h = self._window(x, y, w, h)
+        if w == 0 or h == 0:
+            return None
         if self.depth == 24:
-            assert colors == 0, "Expecting no colors"
-        elif self.depth == 1:
-            colors=2
-            #assert colors == 2, "Expecting two colors"
+            if self.scale == SCALE_ARGB1232:
+                # decoded in place
+                return FBImage(self.get_region(x, y, w, h).buf, w, h, GS8)
+            if self.scale == SCALE_BW:
+                fmt = MONO_HLSB
+                stride = (w + 7) // 8
+            else:
+                fmt = RGB565
+                stride = 2 * w
+            buf = bytearray(stride * h)
+            ob = 0
+            for row in self.rows(x, y, w, h):
+                if fmt == MONO_HLSB:
+                    for idx in range(w):
+                        if row[idx]:
+                            buf[ob + (idx >> 3)] |= 0x80 >> (idx & 7)
+                else:
+                    buf[ob:ob+stride] = array('H', row)
+                ob += stride
+            return FBImage(buf, w, h, fmt)
+
+        if self.depth == 1:
+            fmt = MONO_HLSB
         elif self.depth == 4:
-            colors=16
-            #assert colors == 16, "Expecting 16 colors"
-        elif self.depth == 8:
-            colors=256
+            fmt = GS4_HMSB
         else:
-            assert False, "Other color depth is not supported"
-
-        self.width = lebytes_to_int(img_bytes[18:22])
-        self.height = lebytes_to_int(img_bytes[22:26])
-        # print('size: ' + str(self.width) + ' x ' + str(self.height))
-
-        start_pos = lebytes_to_int(img_bytes[10:14])
-        end_pos = start_pos + lebytes_to_int(img_bytes[34:38])
-        # print ('start: ' + str(start_pos))
-        # print ('end: ' + str(end_pos))
-        self._pixel_data = img_bytes[start_pos:end_pos]
-        # print('pix_len: '+str(len(self._pixel_data)))
-        self.bmp_size=end_pos
-        
-        start_pos = 0x36
-        end_pos = start_pos + 4*colors
-        tmp_color_table = img_bytes[start_pos:end_pos]
-        self._color_table=[]
-        for idx in range(colors):
-            self._color_table.append([tmp_color_table[4*idx],tmp_color_table[4*idx+1],tmp_color_table[4*idx+2]])
-        downscale(self.scale, self._color_table, self._user_convert)
+            fmt = GS8
+        # rows are copied in top-down order
+        stride = (w * self.depth + 7) // 8
+        buf = bytearray(stride * h)
+        mv = memoryview(buf)
+        ofs = (x * self.depth) // 8
+        shift = (x * self.depth) & 7
+        if shift:
+            # window does not start at byte boundary
+            n = ((x + w) * self.depth + 7) // 8 - ofs
+            raw = bytearray(n + 1)
+            rawmv = memoryview(raw)[:n]
+        f = self._open()
+        try:
+            ob = 0
+            for y in range(y, y + h):
+                if shift:
+                    self._read_row(f, y, rawmv, ofs)
+                    for idx in range(stride):
+                        buf[ob + idx] = ((raw[idx] << shift) | (raw[idx+1] >> (8 - shift))) & 0xFF
+                else:
+                    self._read_row(f, y, mv[ob:ob+stride], ofs)
+                ob += stride
+        finally:
+            if f is not None:
+                f.close()
+        # palette is not needed if pixel value is the color
+        palette = None
+        for idx in range(len(self._color_table)):
+            if self._color_table[idx] != idx:
+                palette = FrameBuffer(bytearray(2*len(self._color_table)), len(self._color_table), 1, RGB565)
+                for idx in range(len(self._color_table)):
+                    palette.pixel(idx, 0, self._color_table[idx])
+                break
+        return FBImage(buf, w, h, fmt, stride * 8 // self.depth, palette)
+
+    def _read_img_data(self, stream):
+        hdr = bytearray(54)
+        with open(self._filename, 'rb') as f:
+            f.readinto(hdr)
+            (sign, _, _, _, start_pos, dib_size, width, height, _, depth,
+             compression, _, _, _, colors, _) = struct.unpack_from('<HIHHIIiiHHIIiiII', hdr)
+
+            # Before we proceed, we need to ensure certain conditions are met
+            assert sign == 0x4D42, "Not a valid BMP file"
+            assert compression == 0, "Compression is not supported"
+            self.depth = depth
+            # print('colors='+str(colors)+', depth='+str(self.depth))
+            if self.depth == 24:
+                colors = 0
+                self._decode = self._decode_24bpp
+                self._convert = _converter(self.scale, self._user_convert) or _converter(SCALE_NONE)
+            elif self.depth == 1:
+                self._decode = self._decode_1bpp
+            elif self.depth == 4:
+                self._decode = self._decode_4bpp
+            elif self.depth == 8:
+                self._decode = self._decode_8bpp
+            else:
+                assert False, "Other color depth is not supported"
+            if self.depth != 24 and (colors == 0 or colors > (1 << self.depth)):
+                colors = 1 << self.depth
+
+            # negative height is top-down bitmap
+            self._top_down = height < 0
+            self.width = width
+            self.height = abs(height)
+            # print('size: ' + str(self.width) + ' x ' + str(self.height))
+
+            # rows are aligned to 4 bytes
+            self._stride = ((self.width * self.depth + 31) // 32) * 4
+            self._offset = start_pos
+            self.bmp_size = start_pos + self._stride * self.height
+
+            f.seek(14 + dib_size)
+            tmp_color_table = f.read(4*colors)
+            self._color_table=[]
+            for idx in range(colors):
+                self._color_table.append([tmp_color_table[4*idx+2],tmp_color_table[4*idx+1],tmp_color_table[4*idx]])
+            downscale(self.scale, self._color_table, self._user_convert)
+
+            if not stream:
+                f.seek(start_pos)
+                self._pixel_data = memoryview(f.read(self._stride * self.height))
+
 
+class ImageCache(object):
+    """
+    Cache of decoded images (fb_plus.FBImage ready for blit) with a budget
+    in bytes. Images are keyed by (filename, scale, user_convert, format),
+    the least recently used ones are evicted. A hit does not touch the
+    filesystem, changed files are found only by check().
+
+    icons = ImageCache(8192)
+    fb.img(0, 0, icons.get("ico_32x16.bmp", SCALE_BW))
+    """
+    def __init__(self, budget=16384):
+        from fb_plus import LRUCache
+        self._cache = LRUCache(budget, self._evicted)
+        # key: (size, mtime) of the file when it was decoded, only of cached images
+        self._stat = {}
+
+    def _evicted(self, key):
+        del self._stat[key]
+
+    def get(self, filename, scale=SCALE_RGB565, user_convert=None, format=None):
+        """
+        Returns the image as FBImage, the file is decoded only on a miss.
+        format - framebuf format of the image, the image (with its palette)
+        is converted into it once; None keeps the format of get_framebuf()
+        """
+        key = (filename, scale, user_convert, format)
+        img = self._cache.get(key)
+        if img is not None:
+            return img
+        import os
+        from fb_plus import FBImage, _buf_size
+        from framebuf import FrameBuffer, GS4_HMSB, GS8
+        st = os.stat(filename)
+        img = BMPReader(filename, scale, user_convert, stream=True).get_framebuf()
+        if format is not None and (format != img.format or img.palette is not None):
+            buf = bytearray(_buf_size(img.width, img.height, format))
+            FrameBuffer(buf, img.width, img.height, format).blit(img.fbuf, 0, 0, -1, img.palette)
+            img = FBImage(buf, img.width, img.height, format)
+        size = len(img.buf)
+        if img.palette is not None:
+            # RGB565 color table
+            size += 512 if img.format == GS8 else 32 if img.format == GS4_HMSB else 4
+        self._cache.put(key, img, size)
+        if key in self._cache:
+            # not stored when larger than the budget
+            self._stat[key] = (st[6], st[8])
+        return img
+
+    def check(self, filename=None):
+        """
+        Drop images of files (or of the file) whose size or mtime changed
+        since they were decoded. Returns the number of dropped images.
+        """
+        import os
+        n = 0
+        for key in list(self._stat):
+            if filename is not None and key[0] != filename:
+                continue
+            try:
+                st = os.stat(key[0])
+                changed = (st[6], st[8]) != self._stat[key]
+            except OSError:
+                # file removed
+                changed = True
+            if changed:
+                self._cache.remove(key)
+                del self._stat[key]
+                n += 1
+        return n
+
+    def invalidate(self, filename=None):
+        """
+        Drop all images (or the images of the file)
+        """
+        for key in list(self._stat):
+            if filename is None or key[0] == filename:
+                self._cache.remove(key)
+                del self._stat[key]
+
+    def stats(self):
+        """
+        Returns (hits, misses, images, used bytes)
+        """
+        return self._cache.stats()
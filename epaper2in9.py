@@ -58,6 +58,8 @@ TERMINATE_FRAME_READ_WRITE           = const(0xFF)
 
 BUSY = const(1)  # 1=busy, 0=idle
 
+FILL_CHUNK = const(128)  # bytes of the fill pattern buffer
+
 class EPD:
     def __init__(self, spi, cs, dc, rst, busy):
         self.spi = spi
@@ -71,6 +73,19 @@ class EPD:
         self.busy.init(self.busy.IN)
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
+        self.full_every = 0
+        self.partial_count = 0
+        self._last = None
+        self.lut = None
+        # reusable buffers for commands, parameters and fills
+        self._cmd = bytearray(1)
+        self._par = bytearray(4)
+        self._fill = bytearray(FILL_CHUNK)
+        self._fill_color = 0
+        # SPI traffic: cs cycles and bytes, frame_stats are values of the last displayed frame
+        self.transactions = 0
+        self.bytes = 0
+        self.frame_stats = (0, 0)
 
     # 30 bytes (look up tables)
     # original waveshare example
@@ -81,22 +96,50 @@ class EPD:
     #LUT_FULL_UPDATE    = bytearray(b'\x50\xAA\x55\xAA\x11\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xFF\xFF\x1F\x00\x00\x00\x00\x00\x00\x00')
     #LUT_PARTIAL_UPDATE = bytearray(b'\x10\x18\x18\x08\x18\x18\x08\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x13\x14\x44\x12\x00\x00\x00\x00\x00\x00')
 
-    def _command(self, command, data=None):
+    # command with parameters in one cs cycle, cs stays low with keep=True
+    def _command(self, command, data=None, keep=False):
+        self._cmd[0] = command
         self.dc(0)
         self.cs(0)
-        self.spi.write(bytearray([command]))
-        self.cs(1)
+        self.spi.write(self._cmd)
+        self.transactions += 1
+        self.bytes += 1
         if data is not None:
-            self._data(data)
+            self.dc(1)
+            self.spi.write(data)
+            self.bytes += len(data)
+        elif keep:
+            self.dc(1)
+        if not keep:
+            self.cs(1)
 
     def _data(self, data):
         self.dc(1)
         self.cs(0)
         self.spi.write(data)
         self.cs(1)
+        self.transactions += 1
+        self.bytes += len(data)
+
+    # n bytes of color by chunks of the pattern buffer, after _command(..., keep=True)
+    def _fill_data(self, color, n):
+        if self._fill_color != color:
+            fill = self._fill
+            for i in range(len(fill)):
+                fill[i] = color
+            self._fill_color = color
+        mv = memoryview(self._fill)
+        while n > 0:
+            k = min(n, FILL_CHUNK)
+            self.spi.write(mv[:k])
+            n -= k
+            self.bytes += k
 
     def init(self):
         self.reset()
+        self._init_registers()
+
+    def _init_registers(self):
         self._command(DRIVER_OUTPUT_CONTROL, ustruct.pack("<HB", EPD_HEIGHT-1, 0x00))
         self._command(BOOSTER_SOFT_START_CONTROL, b'\xD7\xD6\x9D')
         self._command(WRITE_VCOM_REGISTER, b'\xA8') # VCOM 7C
@@ -116,6 +159,7 @@ class EPD:
         sleep_ms(200)
 
     def set_lut(self, lut):
+        self.lut = lut
         self._command(WRITE_LUT_REGISTER, lut)
 
     # put an image in the frame memory
@@ -137,39 +181,150 @@ class EPD:
         self.set_memory_area(x, y, x_end, y_end)
         self.set_memory_pointer(x, y)
         self._command(WRITE_RAM, image)
+        # frame memory differs from the last frame of display_partial()
+        self._last = None
 
     # replace the frame memory with the specified color
     def clear_frame_memory(self, color):
         self.set_memory_area(0, 0, self.width - 1, self.height - 1)
         self.set_memory_pointer(0, 0)
-        self._command(WRITE_RAM)
         # send the color data
-        for i in range(0, self.width // 8 * self.height):
-            self._data(bytearray([color]))
+        self._command(WRITE_RAM, keep=True)
+        self._fill_data(color, self.width // 8 * self.height)
+        self.cs(1)
+        self._last = None
 
     # draw the current frame memory and switch to the next memory area
     def display_frame(self):
+        self._update()
+        self._frame_done()
+
+    def _update(self):
         self._command(DISPLAY_UPDATE_CONTROL_2, b'\xC4')
         self._command(MASTER_ACTIVATION)
         self._command(TERMINATE_FRAME_READ_WRITE)
         self.wait_until_idle()
 
+    # SPI traffic since the previous frame
+    def _frame_done(self):
+        self.frame_stats = (self.transactions, self.bytes)
+        self.transactions = 0
+        self.bytes = 0
+
     # specify the memory area for data R/W
     def set_memory_area(self, x_start, y_start, x_end, y_end):
-        self._command(SET_RAM_X_ADDRESS_START_END_POSITION)
+        par = self._par
         # x point must be the multiple of 8 or the last 3 bits will be ignored
-        self._data(bytearray([(x_start >> 3) & 0xFF]))
-        self._data(bytearray([(x_end >> 3) & 0xFF]))
-        self._command(SET_RAM_Y_ADDRESS_START_END_POSITION, ustruct.pack("<HH", y_start, y_end))
+        par[0] = (x_start >> 3) & 0xFF
+        par[1] = (x_end >> 3) & 0xFF
+        self._command(SET_RAM_X_ADDRESS_START_END_POSITION, memoryview(par)[:2])
+        ustruct.pack_into("<HH", par, 0, y_start, y_end)
+        self._command(SET_RAM_Y_ADDRESS_START_END_POSITION, par)
 
     # specify the start point for data R/W
     def set_memory_pointer(self, x, y):
-        self._command(SET_RAM_X_ADDRESS_COUNTER)
-        # x point must be the multiple of 8 or the last 3 bits will be ignored
-        self._data(bytearray([(x >> 3) & 0xFF]))
-        self._command(SET_RAM_Y_ADDRESS_COUNTER, ustruct.pack("<H", y))
+        self._set_pointer(x, y)
         self.wait_until_idle()
 
+    def _set_pointer(self, x, y):
+        par = self._par
+        # x point must be the multiple of 8 or the last 3 bits will be ignored
+        par[0] = (x >> 3) & 0xFF
+        self._command(SET_RAM_X_ADDRESS_COUNTER, memoryview(par)[:1])
+        ustruct.pack_into("<H", par, 0, y)
+        self._command(SET_RAM_Y_ADDRESS_COUNTER, memoryview(par)[:2])
+
+    # enable partial update mode used by display_partial()
+    # full_every - number of partial updates before a full refresh (0 = never)
+    def partial_mode(self, full_every=20):
+        self.full_every = full_every
+        self.partial_count = 0
+        self._last = None
+
+    # force the full refresh on the next display_partial()
+    def force_full(self):
+        self._last = None
+
+    # changed windows of the frame against the last displayed one
+    # returns list of (x, y, w, h), x and w are multiples of 8
+    def frame_diff(self, buf):
+        last = self._last
+        rb = self.width // 8
+        wins = []
+        win = None
+        for y in range(self.height):
+            # compared in place, no slices are allocated
+            i = y * rb
+            x1 = 0
+            while x1 < rb and buf[i + x1] == last[i + x1]:
+                x1 += 1
+            if x1 == rb:
+                continue
+            x2 = rb - 1
+            while buf[i + x2] == last[i + x2]:
+                x2 -= 1
+            # join with the previous window if the skipped rows are cheaper than new window
+            if win is not None and (y - win[3] - 1) * (max(x2, win[2]) - min(x1, win[0]) + 1) <= 16:
+                win[0] = min(x1, win[0])
+                win[2] = max(x2, win[2])
+                win[3] = y
+            else:
+                win = [x1, y, x2, y]
+                wins.append(win)
+        return [(w[0] * 8, w[1], (w[2] - w[0] + 1) * 8, w[3] - w[1] + 1) for w in wins]
+
+    # send window of the whole frame buffer to the frame memory
+    def _write_window(self, buf, x, y, w, h):
+        rb = self.width // 8
+        self.set_memory_area(x, y, x + w - 1, y + h - 1)
+        self.set_memory_pointer(x, y)
+        mv = memoryview(buf)
+        if w == self.width:
+            self._command(WRITE_RAM, mv[y * rb:(y + h) * rb])
+            return
+        # all rows of the window in one cs cycle
+        self._command(WRITE_RAM, keep=True)
+        for i in range(y * rb + x // 8, (y + h) * rb, rb):
+            self.spi.write(mv[i:i + w // 8])
+            self.bytes += w // 8
+        self.cs(1)
+
+    # display the whole frame buffer, only the changed windows are sent and refreshed
+    # partial refresh needs the same data in both memory areas of the controller
+    def display_partial(self, buf):
+        wins = self._partial_write(buf)
+        if wins is not None:
+            self._update()
+            self._partial_done(buf, wins)
+
+    # write changed windows (or whole frame) before the refresh, None if nothing changed
+    def _partial_write(self, buf):
+        if self._last is None or (self.full_every and self.partial_count >= self.full_every):
+            self._last = None
+            self.set_lut(self.LUT_FULL_UPDATE)
+            wins = [(0, 0, self.width, self.height)]
+        else:
+            wins = self.frame_diff(buf)
+            if not wins:
+                self._frame_done()
+                return None
+        for w in wins:
+            self._write_window(buf, w[0], w[1], w[2], w[3])
+        return wins
+
+    # the same windows into the second memory area after the refresh
+    def _partial_done(self, buf, wins):
+        for w in wins:
+            self._write_window(buf, w[0], w[1], w[2], w[3])
+        if self._last is None:
+            self.set_lut(self.LUT_PARTIAL_UPDATE)
+            self._last = bytearray(buf)
+            self.partial_count = 0
+        else:
+            self._last[:] = buf
+            self.partial_count += 1
+        self._frame_done()
+
     # to wake call reset() or init()
     def sleep(self):
         self._command(DEEP_SLEEP_MODE)
@@ -0,0 +1,102 @@
+"""
+asyncio variant of the Waveshare 2.9" e-paper driver (epaper2in9)
+
+Waiting for the busy pin does not block the interpreter. The end of the
+refresh is signalled by the falling edge of the busy pin (pin IRQ and
+asyncio.ThreadSafeFlag), or when the pin has no IRQ by a short poll which
+starts near the end of the expected refresh time.
+"""
+
+from micropython import const
+from time import ticks_ms, ticks_diff
+from epaper2in9 import EPD, BUSY, DEEP_SLEEP_MODE, DISPLAY_UPDATE_CONTROL_2, \
+    MASTER_ACTIVATION, TERMINATE_FRAME_READ_WRITE
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+POLL_MS = const(5)  # poll period of the busy pin without IRQ
+
+class EPDAsync(EPD):
+    def __init__(self, spi, cs, dc, rst, busy, irq=True):
+        super().__init__(spi, cs, dc, rst, busy)
+        # duration of the last refresh and of the last wait for the busy pin
+        self.refresh_ms = 0
+        self.wait_ms = 0
+        # expected refresh time for each LUT
+        self._expect = {}
+        self._flag = None
+        if irq:
+            try:
+                self._flag = asyncio.ThreadSafeFlag()
+                busy.irq(self._busy_irq, busy.IRQ_FALLING)
+            except:
+                # no IRQ on this pin (or port), use poll
+                self._flag = None
+
+    def _busy_irq(self, pin):
+        self._flag.set()
+
+    async def wait_until_idle(self):
+        t = ticks_ms()
+        if self._flag is not None:
+            while self.busy.value() == BUSY:
+                # a flag left set by an older edge only repeats the check
+                await self._flag.wait()
+        elif self.busy.value() == BUSY:
+            # sleep most of the expected time, then poll fast
+            expect = self._expect.get(id(self.lut), 0)
+            if expect > 4 * POLL_MS:
+                await asyncio.sleep_ms(expect - 4 * POLL_MS)
+            while self.busy.value() == BUSY:
+                await asyncio.sleep_ms(POLL_MS)
+        self.wait_ms = ticks_diff(ticks_ms(), t)
+
+    async def reset(self):
+        self.rst(0)
+        await asyncio.sleep_ms(200)
+        self.rst(1)
+        await asyncio.sleep_ms(200)
+
+    async def init(self):
+        await self.reset()
+        self._init_registers()
+
+    # the panel is busy only during refresh, RAM pointer does not wait
+    def set_memory_pointer(self, x, y):
+        self._set_pointer(x, y)
+
+    async def set_frame_memory(self, image, x, y, w, h):
+        await self.wait_until_idle()
+        EPD.set_frame_memory(self, image, x, y, w, h)
+
+    async def clear_frame_memory(self, color):
+        await self.wait_until_idle()
+        EPD.clear_frame_memory(self, color)
+
+    async def display_frame(self):
+        await self._update()
+        self._frame_done()
+
+    async def _update(self):
+        await self.wait_until_idle()
+        self._command(DISPLAY_UPDATE_CONTROL_2, b'\xC4')
+        self._command(MASTER_ACTIVATION)
+        self._command(TERMINATE_FRAME_READ_WRITE)
+        t = ticks_ms()
+        await self.wait_until_idle()
+        self.refresh_ms = ticks_diff(ticks_ms(), t)
+        self._expect[id(self.lut)] = self.refresh_ms
+
+    async def display_partial(self, buf):
+        await self.wait_until_idle()
+        wins = self._partial_write(buf)
+        if wins is not None:
+            await self._update()
+            self._partial_done(buf, wins)
+
+    async def sleep(self):
+        await self.wait_until_idle()
+        self._command(DEEP_SLEEP_MODE)
+        await self.wait_until_idle()
@@ -0,0 +1,129 @@
+"""
+Double buffered render/transmit pipeline for e-paper displays
+
+The application draws the next frame into the back buffer, while a worker
+thread (the second core of ESP32) sends the front buffer to the display and
+waits for the end of the refresh. swap() hands the back buffer over to the
+worker, it waits while the worker is busy with the previous frame.
+"""
+
+import _thread
+from time import ticks_ms, ticks_diff
+from framebuf import MONO_HLSB
+from fb_plus import fbplus
+
+class EPDPipeline():
+    def __init__(self, epd, partial=False):
+        '''
+        epd - EPD driver (epaper2in9.EPD), used only by the worker thread
+        partial - use display_partial() (epd.partial_mode() must be set)
+        '''
+        self.epd = epd
+        self.partial = partial
+        w = epd.width
+        h = epd.height
+        self._bufs = (bytearray(w * h // 8), bytearray(w * h // 8))
+        self._fbs = (fbplus(self._bufs[0], w, h, MONO_HLSB), fbplus(self._bufs[1], w, h, MONO_HLSB))
+        self._back = 0
+        # _go is released for the worker with a new frame, _idle by the worker when done
+        self._go = _thread.allocate_lock()
+        self._go.acquire()
+        self._idle = _thread.allocate_lock()
+        self._stop = False
+        self.error = None
+        self.reset_stats()
+        _thread.start_new_thread(self._worker, ())
+
+    @property
+    def fb(self):
+        # back buffer (fbplus) for drawing
+        return self._fbs[self._back]
+
+    @property
+    def buf(self):
+        return self._bufs[self._back]
+
+    def swap(self, copy=True, block=True):
+        '''
+        Send the back buffer to the display and draw into the other one.
+        copy - the new back buffer starts with the content of the sent frame
+        block - wait for the previous frame, with block=False return False
+        instead of waiting (the frame is not sent)
+        '''
+        t = ticks_ms()
+        if not self._idle.acquire(1 if block else 0):
+            return False
+        t1 = ticks_ms()
+        self._wait_ms += ticks_diff(t1, t)
+        if self._last is not None:
+            self._render_ms += ticks_diff(t, self._last)
+        self._last = t1
+        if self.error is not None:
+            # reported once, the next swap() sends again
+            self._idle.release()
+            e, self.error = self.error, None
+            raise e
+        front = self._back
+        self._back ^= 1
+        if copy:
+            self._bufs[self._back][:] = self._bufs[front]
+        self._go.release()
+        return True
+
+    def wait(self):
+        # wait until the last frame is on the display
+        self._idle.acquire()
+        self._idle.release()
+
+    def stop(self):
+        self.wait()
+        self._idle.acquire()
+        self._stop = True
+        self._go.release()
+
+    def _worker(self):
+        while True:
+            self._go.acquire()
+            if self._stop:
+                self._idle.release()
+                break
+            t = ticks_ms()
+            buf = self._bufs[self._back ^ 1]
+            try:
+                if self.partial:
+                    self.epd.display_partial(buf)
+                else:
+                    self.epd.set_frame_memory(buf, 0, 0, self.epd.width, self.epd.height)
+                    self.epd.display_frame()
+            except Exception as e:
+                self.error = e
+            self._busy_ms += ticks_diff(ticks_ms(), t)
+            self.frames += 1
+            self._idle.release()
+
+    def reset_stats(self):
+        self.frames = 0
+        self._start = ticks_ms()
+        self._last = None
+        self._busy_ms = 0
+        self._render_ms = 0
+        self._wait_ms = 0
+
+    def stats(self):
+        '''
+        fpm - achieved frames per minute
+        serial_fpm - frames per minute without the pipeline (render + display)
+        overlap - part of the display time hidden behind rendering (0..1)
+        busy_ms, render_ms, wait_ms - time of the worker, of drawing and of waiting in swap()
+        '''
+        elapsed = max(ticks_diff(ticks_ms(), self._start), 1)
+        serial = max(self._busy_ms + self._render_ms, 1)
+        return {
+            'frames': self.frames,
+            'fpm': self.frames * 60000 // elapsed,
+            'serial_fpm': self.frames * 60000 // serial,
+            'overlap': (self._busy_ms - self._wait_ms) / self._busy_ms if self._busy_ms else 0,
+            'busy_ms': self._busy_ms,
+            'render_ms': self._render_ms,
+            'wait_ms': self._wait_ms,
+        }
@@ -0,0 +1,237 @@
+"""
+Retained display list for FrBuffExpansion
+
+Drawing calls are recorded into an array of integers: opcode, number of
+arguments, mask of arguments stored as references (strings, images, lists
+of coordinates, ints out of 32-bit range, ...), index of keyword arguments
+and the arguments. The list can be replayed into another FrameBuffer, only
+into a rectangle, and two lists can be compared op by op.
+"""
+
+from array import array
+import fb_plus
+
+# recorded methods, index is the opcode
+_OPS = (
+    'fill', 'pixel', 'hline', 'vline', 'line', 'rect', 'fill_rect', 'ellipse',
+    'poly', 'text', 'blit', 'hexagonI4', 'circle', 'fill_circle', 'setText32',
+    'putText32', 'putTextAtlas', 'drawText32', 'img', 'scroll',
+)
+
+# positions of x, y arguments for translation in clipped replay
+_XY = {
+    'pixel': (0,), 'hline': (0,), 'vline': (0,), 'line': (0, 2), 'rect': (0,),
+    'fill_rect': (0,), 'ellipse': (0,), 'poly': (0,), 'text': (1,),
+    'blit': (1,), 'hexagonI4': (0, 2), 'circle': (0,), 'fill_circle': (0,),
+    'putText32': (1,), 'putTextAtlas': (2,), 'drawText32': (1,), 'img': (0,),
+}
+
+# parameters of recorded methods and defaults of the optional ones, keyword
+# arguments are recorded at their positions
+_PARAMS = {
+    'fill': (('c',), ()),
+    'pixel': (('x', 'y', 'c'), (None,)),
+    'hline': (('x', 'y', 'w', 'c'), ()),
+    'vline': (('x', 'y', 'h', 'c'), ()),
+    'line': (('x1', 'y1', 'x2', 'y2', 'c'), ()),
+    'rect': (('x', 'y', 'w', 'h', 'c', 'f'), (False,)),
+    'fill_rect': (('x', 'y', 'w', 'h', 'c'), ()),
+    'ellipse': (('x', 'y', 'xr', 'yr', 'c', 'f', 'm'), (False, 0xF)),
+    'poly': (('x', 'y', 'coords', 'c', 'f'), (False,)),
+    'text': (('s', 'x', 'y', 'c'), (1,)),
+    'blit': (('fbuf', 'x', 'y', 'key', 'palette'), (-1, None)),
+    'hexagonI4': (('x1', 'y1', 'x2', 'y2', 'b', 'c'), ()),
+    'circle': (('x0', 'y0', 'r', 'c', 'f'), (False,)),
+    'fill_circle': (('x0', 'y0', 'r', 'c'), ()),
+    'setText32': (('height', 'width', 'bold', 'angle', 'gap'), (None, None, None, None, 1)),
+    'putText32': (('txt', 'x', 'y', 'c'), ()),
+    'putTextAtlas': (('font', 'txt', 'x', 'y', 'c'), ()),
+    'drawText32': (('txt', 'x', 'y', 'c', 'width', 'align', 'spacing'), (None, fb_plus.ALIGN_LEFT, None)),
+    'img': (('x0', 'y0', 'pixels', 'rotation', 'key'), (0, -1)),
+    'scroll': (('xstep', 'ystep'), ()),
+}
+
+_PIXEL = _OPS.index('pixel')
+
+_HEAD = 4   # opcode, number of arguments, mask of references, keyword arguments (-1 none)
+
+def _positional(name, args, kwargs):
+    # keyword arguments moved to their positions (gaps by defaults),
+    # so that x, y are translated in clipped replay and equal calls are equal
+    names, defaults = _PARAMS[name]
+    first = len(names) - len(defaults)
+    last = -1
+    for i in range(len(names)):
+        if names[i] in kwargs:
+            last = i
+    args = list(args)
+    kwargs = dict(kwargs)
+    for i in range(len(args), last + 1):
+        if names[i] in kwargs:
+            args.append(kwargs.pop(names[i]))
+        elif i >= first:
+            args.append(defaults[i - first])
+        else:
+            # missing argument, the call fails when drawn
+            break
+    return args, kwargs
+
+class DisplayList():
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.ops = array('i')
+        self.refs = []
+        self._pos = array('i')
+        self._refkey = {}
+        self._fx = None
+        self._depth = 0
+
+    def __len__(self):
+        return len(self._pos)
+
+    def start(self, fx, draw=True):
+        '''
+        Record drawing calls of FrBuffExpansion fx until stop().
+        draw - draw them at the same time
+        Calls made inside a recorded call (e.g. hexagonI4 of putText32) are
+        not recorded. The list starts with the current text parameters.
+        '''
+        self.stop()
+        self._fx = fx
+        self.draw = draw
+        gap = fx.shift - 2*fx.width - fx.bold
+        self._add(_OPS.index('setText32'), (fx.height, fx.width, fx.bold, fx.angle, gap), None)
+        hooks = {}
+        for op in range(len(_OPS)):
+            hooks[_OPS[op]] = self._hook(op)
+        fx._set_hooks('record', hooks)
+
+    def stop(self):
+        if self._fx is not None:
+            self._fx._set_hooks('record', None)
+            self._fx = None
+
+    def _hook(self, op):
+        def hook(method):
+            def wrapper(*args, **kwargs):
+                if op == _PIXEL and (args[2] if len(args) > 2 else kwargs.get('c')) is None:
+                    # pixel(x, y) reads, nothing to record
+                    return method(*args, **kwargs)
+                if self._depth == 0:
+                    self._add(op, args, kwargs)
+                    if not self.draw and _OPS[op] != 'setText32':
+                        return None
+                self._depth += 1
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self._depth -= 1
+            return wrapper
+        return hook
+
+    def _ref(self, obj):
+        # index of shared reference, equal strings and the same objects are stored once
+        try:
+            key = (type(obj), obj) if isinstance(obj, (str, bytes)) else id(obj)
+        except TypeError:
+            key = id(obj)
+        i = self._refkey.get(key)
+        if i is None:
+            i = len(self.refs)
+            self.refs.append(obj)
+            self._refkey[key] = i
+        return i
+
+    def _add(self, op, args, kwargs):
+        if kwargs:
+            args, kwargs = _positional(_OPS[op], args, kwargs)
+        ops = self.ops
+        self._pos.append(len(ops))
+        mask = 0
+        vals = []
+        for i in range(len(args)):
+            a = args[i]
+            # ints out of the array range (e.g. RGB888 colors) are references
+            if isinstance(a, int) and -0x80000000 <= a <= 0x7FFFFFFF:
+                vals.append(a)
+            else:
+                vals.append(self._ref(a))
+                mask |= 1 << i
+        ops.append(op)
+        ops.append(len(args))
+        ops.append(mask)
+        ops.append(self._ref(kwargs) if kwargs else -1)
+        for v in vals:
+            ops.append(v)
+
+    def op(self, i):
+        '''
+        Recorded call i as (method name, args, kwargs)
+        '''
+        ops = self.ops
+        p = self._pos[i]
+        n = ops[p + 1]
+        mask = ops[p + 2]
+        args = []
+        for j in range(n):
+            v = ops[p + _HEAD + j]
+            args.append(self.refs[v] if mask & (1 << j) else v)
+        kw = self.refs[ops[p + 3]] if ops[p + 3] >= 0 else {}
+        return _OPS[ops[p]], args, kw
+
+    def replay(self, target, clip=None):
+        '''
+        Draw the list into FrBuffExpansion or FrameBuffer (or its replacement) target.
+        clip - (x, y, w, h), only this rectangle of target is changed. Ops
+        outside it are skipped, the others are drawn into a scratch buffer of
+        the rectangle (target needs known size and format, see fbadd).
+        '''
+        if not isinstance(target, fb_plus.FrBuffExpansion):
+            target = fb_plus.fbadd(target)
+        if clip is None:
+            for i in range(len(self)):
+                name, args, kw = self.op(i)
+                getattr(target, name)(*args, **kw)
+            return
+        if target.fb_format is None:
+            raise ValueError("unknown format of FrameBuffer")
+        cx, cy, cw, ch = clip
+        scratch = fb_plus.fbplus(bytearray(fb_plus._buf_size(cw, ch, target.fb_format)),
+                                 cw, ch, target.fb_format)
+        # current content of the rectangle
+        scratch.fb.blit(fb_plus._blit_source(target.fb), -cx, -cy)
+        for i in range(len(self)):
+            name, args, kw = self.op(i)
+            # skip ops outside (whole screen ops like fill and scroll have
+            # no area here)
+            r = self.extent(i, scratch) if name not in ('fill', 'scroll', 'blit') else None
+            if r is not None and \
+                    (r[0] >= cx + cw or r[1] >= cy + ch or r[0] + r[2] <= cx or r[1] + r[3] <= cy):
+                continue
+            for j in _XY.get(name, ()):
+                args[j] -= cx
+                args[j+1] -= cy
+            getattr(scratch, name)(*args, **kw)
+        target.fb.blit(scratch.fb, cx, cy)
+
+    def diff(self, other):
+        '''
+        Indices of ops different from the other list (compared by position,
+        references by ==), ops missing in one of the lists are included.
+        '''
+        changed = []
+        for i in range(max(len(self), len(other))):
+            if i >= len(self) or i >= len(other) or self.op(i) != other.op(i):
+                changed.append(i)
+        return changed
+
+    def extent(self, i, fx):
+        '''
+        Area (x, y, w, h) changed by op i drawn by fx, None if unknown
+        '''
+        name, args, kw = self.op(i)
+        if name not in fb_plus._EXTENTS:
+            return None
+        return fb_plus._EXTENTS[name](fx, *args, **kw)
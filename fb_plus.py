@@ -8,15 +8,22 @@
 # (https://github.com/adafruit/Adafruit-GFX-Library)
 
 
-from framebuf import FrameBuffer
+from framebuf import FrameBuffer, MONO_HLSB, RGB565, GS8
 from micropython import const
+from collections import OrderedDict
+from array import array
 import math
+import struct
 
 ROT_0_DEG = const(0)
 ROT_90_DEG = const(1)
 ROT_180_DEG = const(2)
 ROT_270_DEG = const(3)
 
+ALIGN_LEFT = const(0)
+ALIGN_CENTER = const(1)
+ALIGN_RIGHT = const(2)
+
 
 '''
 32-segment charset lookup table
@@ -83,153 +90,226 @@ _SEGM = const((
 # pairs: 0&1, 4&5, A&E, 14&15, 19&1A
 _PAIRS = bytearray(b'\x01\x00\x00\x00\x01\x00\x00\x00\x00\x00\x04\x00\x00\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00')
 
-# Character table of ASCII from 32..127
-_CH32SET = const((
-	0x00000000, #  0000 0000 0000 0000 - 0000 0000 0000 0000 (space)
-	0x40000100, #  0100 0000 0000 0000 - 0000 0001 0000 0000 !
-	0x00000180, #  0000 0000 0000 0000 - 0000 0001 1000 0000 "
-	0x0030550C, #  0000 0000 0011 0000 - 0101 0101 0000 1100 #
-	0x000055BB, #  0000 0000 0000 0000 - 0101 0101 1011 1011 $
-#	0x00007799, #  0000 0000 0000 0000 - 0111 0111 1001 1001 %
-	0x000A2299, #  0000 0000 0000 1010 - 0010 0010 1001 1001 %
-	0x0002C961, #  0000 0000 0000 0010 - 1100 1001 0110 0001 &
-	0x00000200, #  0000 0000 0000 0000 - 0000 0010 0000 0000 '
-	0x000C0012, #  0000 0000 0000 1100 - 0000 0000 0001 0010 (
-	0x00030021, #  0000 0000 0000 0011 - 0000 0000 0010 0001 )
-	0x0000FF00, #  0000 0000 0000 0000 - 1111 1111 0000 0000 *
-	0x00005500, #  0000 0000 0000 0000 - 0101 0101 0000 0000 +
-	0x10000000, #  0001 0000 0000 0000 - 0000 0000 0000 0000 ,
-	0x00004400, #  0000 0000 0000 0000 - 0100 0100 0000 0000 -
-	0x20000000, #  0010 0000 0000 0000 - 0000 0000 0000 0000 .
-	0x00002200, #  0000 0000 0000 0000 - 0010 0010 0000 0000 /
-	0x000022FF, #  0000 0000 0000 0000 - 0010 0010 1111 1111 0
-	0x00081130, #  0000 0000 0000 1000 - 0001 0001 0011 0000 1
-	0x00004477, #  0000 0000 0000 0000 - 0100 0100 0111 0111 2
-	0x0000443F, #  0000 0000 0000 0000 - 0100 0100 0011 1111 3
-#	0x0000448C, #  0000 0000 0000 0000 - 0100 0100 1000 1100 4
-	0x0008440C, #  0000 0000 0000 1000 - 0100 0100 0000 1100 4
-	0x000044BB, #  0000 0000 0000 0000 - 0100 0100 1011 1011 5
-#	0x000244A3, #  0000 0000 0000 0010 - 0100 0100 1010 0011 5
-	0x0008447A, #  0000 0000 0000 1000 - 0100 0100 0111 1010 6
-#	0x000044FB, #  0000 0000 0000 0000 - 0100 0100 1111 1011 6
-	0x00002203, #  0000 0000 0000 0000 - 0010 0010 0000 0011 7
-#	0x0000000F, #  0000 0000 0000 0000 - 0000 0000 0000 1111 7
-	0x000044FF, #  0000 0000 0000 0000 - 0100 0100 1111 1111 8
-	0x000044BF, #  0000 0000 0000 0000 - 0100 0100 1011 1111 9
-	0xC0000000, #  1100 0000 0000 0000 - 0000 0000 0000 0000 :
-	0x50000000, #  0101 0000 0000 0000 - 0000 0000 0000 0000 ;
-	0x000C0000, #  0000 0000 0000 1100 - 0000 0000 0000 0000 <
-	0x00304400, #  0000 0000 0011 0000 - 0100 0100 0000 0000 =
-	0x00030000, #  0000 0000 0000 0011 - 0000 0000 0000 0000 >
-	0x20001407, #  0010 0000 0000 0000 - 0001 0100 0000 0111 ?
-
-	0x0000507F, #  0000 0000 0000 0000 - 0101 0000 0111 1111 @
-#	0x000044CF, #  0000 0000 0000 0000 - 0100 0100 1100 1111 A
-	0x00094448, #  0000 0000 0000 1001 - 0100 0100 0100 1000 A
-	0x0000153F, #  0000 0000 0000 0000 - 0001 0101 0011 1111 B
-	0x000000F3, #  0000 0000 0000 0000 - 0000 0000 1111 0011 C
-	0x0000113F, #  0000 0000 0000 0000 - 0001 0001 0011 1111 D
-	0x000040F3, #  0000 0000 0000 0000 - 0100 0000 1111 0011 E
-	0x000040C3, #  0000 0000 0000 0000 - 0100 0000 1100 0011 F
-	0x000004FB, #  0000 0000 0000 0000 - 0000 0100 1111 1011 G
-#	0x0008047A, #  0000 0000 0000 1000 - 0000 0100 0111 1010 G
-	0x000044CC, #  0000 0000 0000 0000 - 0100 0100 1100 1100 H
-	0x00001133, #  0000 0000 0000 0000 - 0001 0001 0011 0011 I
-	0x0000007C, #  0000 0000 0000 0000 - 0000 0000 0111 1100 J
-	0x000046C8, #  0000 0000 0000 0000 - 0100 0110 1100 1000 K
-#	0x00004AC0, #  0000 0000 0000 0000 - 0100 1010 1100 0000 K
-	0x000000F0, #  0000 0000 0000 0000 - 0000 0000 1111 0000 L
-	0x000082CC, #  0000 0000 0000 0000 - 1000 0010 1100 1100 M
-	0x000088CC, #  0000 0000 0000 0000 - 1000 1000 1100 1100 N
-	0x000000FF, #  0000 0000 0000 0000 - 0000 0000 1111 1111 O
-	0x000044C7, #  0000 0000 0000 0000 - 0100 0100 1100 0111 P
-	0x000008FF, #  0000 0000 0000 0000 - 0000 1000 1111 1111 Q
-#	0x000A0866, #  0000 0000 0000 1010 - 0000 1000 0110 0110 Q
-	0x00004CC7, #  0000 0000 0000 0000 - 0100 1100 1100 0111 R
-#	0x000044BB, #  0000 0000 0000 0000 - 0100 0100 1011 1011 S
-	0x000A4422, #  0000 0000 0000 1010 - 0100 0100 0010 0010 S
-	0x00001103, #  0000 0000 0000 0000 - 0001 0001 0000 0011 T
-	0x000000FC, #  0000 0000 0000 0000 - 0000 0000 1111 1100 U
-	0x00060084, #  0000 0000 0000 0110 - 0000 0000 1000 0100 V
-#	0x000022C0, #  0000 0000 0000 0000 - 0010 0010 1100 0000 V
-	0x000028CC, #  0000 0000 0000 0000 - 0010 1000 1100 1100 W
-	0x0000AA00, #  0000 0000 0000 0000 - 1010 1010 0000 0000 X
-	0x00009200, #  0000 0000 0000 0000 - 1001 0010 0000 0000 Y
-	0x00002233, #  0000 0000 0000 0000 - 0010 0010 0011 0011 Z
-	0x000000E1, #  0000 0000 0000 0000 - 0000 0000 1110 0001 [
-	0x00008800, #  0000 0000 0000 0000 - 1000 1000 0000 0000 (backslash)
-	0x0000001E, #  0000 0000 0000 0000 - 0000 0000 0001 1110 ]
-	0x00090000, #  0000 0000 0000 1001 - 0000 0000 0000 0000 ^
-	0x06000000, #  0000 0110 0000 0000 - 0000 0000 0000 0000 _
-	
-	0x00008000, #  0000 0000 0000 0000 - 1000 0000 0000 0000 `	-> small letters
-	0x00005860, #  0000 0000 0000 0000 - 0101 1000 0110 0000 a
-	0x000044F8, #  0000 0000 0000 0000 - 0100 0100 1111 1000 b
-	0x00004470, #  0000 0000 0000 0000 - 0100 0100 0111 0000 c
-	0x0000447C, #  0000 0000 0000 0000 - 0100 0100 0111 1100 d
-	0x00804470, #  0000 0000 1000 0000 - 0100 0100 0111 0000 e
-	0x00005502, #  0000 0000 0000 0000 - 0101 0101 0000 0010 f
-	0x07004478, #  0000 0111 0000 0000 - 0100 0100 0111 1000 g
-	0x000044C8, #  0000 0000 0000 0000 - 0100 0100 1100 1000 h
-	0x80005030, #  1000 0000 0000 0000 - 0101 0000 0011 0000 i
-	0x9C005000, #  1001 1100 0000 0000 - 0101 0000 0000 0000 j
-	0x004044C0, #  0000 0000 0100 0000 - 0100 0100 1100 0000 k
-	0x000800E1, #  0000 0000 0000 1000 - 0000 0000 1110 0001 l
-#	0x00001110, #  0000 0000 0000 0000 - 0001 0001 0001 0000 l
-	0x00005448, #  0000 0000 0000 0000 - 0101 0100 0100 1000 m
-	0x00004448, #  0000 0000 0000 0000 - 0100 0100 0100 1000 n
-	0x00004478, #  0000 0000 0000 0000 - 0100 0100 0111 1000 o
-	0x08004478, #  0000 1000 0000 0000 - 0100 0100 0111 1000 p
-	0x01004478, #  0000 0001 0000 0000 - 0100 0100 0111 1000 q
-	0x00002440, #  0000 0000 0000 0000 - 0010 0100 0100 0000 r
-	0x00404430, #  0000 0000 0100 0000 - 0100 0100 0011 0000 s
-	0x000040F0, #  0000 0000 0000 0000 - 0100 0000 1111 0000 t
-	0x00000078, #  0000 0000 0000 0000 - 0000 0000 0111 1000 u
-	0x00060000, #  0000 0000 0000 0110 - 0000 0000 0000 0000 v
-	0x00002848, #  0000 0000 0000 0000 - 0010 1000 0100 1000 w
-	0x00C00000, #  0000 0000 1100 0000 - 0000 0000 0000 0000 x
-	0x07040018, #  0000 0111 0000 0100 - 0000 0000 0001 1000 y
-	0x00804430, #  0000 0000 1000 0000 - 0100 0100 0011 0000 z
-	0x00005112, #  0000 0000 0000 0000 - 0101 0001 0001 0010 {
-	0x00001100, #  0000 0000 0000 0000 - 0001 0001 0000 0000 |
-	0x00001521, #  0000 0000 0000 0000 - 0001 0101 0010 0001 }
-	0x00000585, #  0000 0000 0000 0000 - 0000 0101 1000 0101 ~
-	0x0000FFFF, #  0000 0000 0000 0000 - 1111 1111 1111 1111 dummy
-    
-	0x00384400, #  0000 0000 0011 1000 - 0100 0100 0000 0000 <=
-	0x00314400, #  0000 0000 0011 0001 - 0100 0100 0000 0000 >=
-	0x00004181, #  0000 0000 0000 0000 - 0100 0001 1000 0001 °
-	0x00024860, #  0000 0000 0000 0010 - 0100 1000 0110 0000 alpha
-    0x0808045E, #  0000 1000 0000 1000 - 0000 0100 0101 1110 beta
-	0x000000C3, #  0000 0000 0000 0000 - 0000 0000 1100 0011 GAMA
-	0x00006C00, #  0000 0000 0000 0000 - 0110 1100 0000 0000 pi
-	0x0000A033, #  0000 0000 0000 0000 - 1010 0000 0011 0011 SIGMA
-	0x08001070, #  0000 1000 0000 0000 - 0001 0000 0111 0000 mi
-	0x00005410, #  0000 0000 0000 0000 - 0101 0100 0001 0000 tau
-	0x0000C871, #  0000 0000 0000 0000 - 1100 1000 0111 0001 delta
-	0x10005578, #  0001 0000 0000 0000 - 0101 0101 0111 1000 fi
-	0x0000AA88, #  0000 0000 0000 0000 - 1010 1010 1000 1000 chi
-	0x00002830, #  0000 0000 0000 0000 - 0010 1000 0011 0000 DELTA
-	0xC0004400, #  1100 0000 0000 0000 - 0100 0100 0000 0000 fraction
-	0x070044FB, #  0000 0111 0000 0000 - 0100 0100 1111 1011 paragraph
-	0x000C0A00, #  0000 0000 0000 1100 - 0000 1010 0000 0000 <<
-	0x0003A000, #  0000 0000 0000 0011 - 1010 0000 0000 0000 >>
-	0x000C4400, #  0000 0000 0000 1100 - 0100 0100 0000 0000 <-
-	0x00034400, #  0000 0000 0000 0011 - 0100 0100 0000 0000 ->
-	0x00091100, #  0000 0000 0000 1001 - 0001 0001 0000 0000 UP
-	0x00061100, #  0000 0000 0000 0110 - 0001 0001 0000 0000 DOWN
-	0x00005522, #  0000 0000 0000 0000 - 0101 0101 0010 0010 rise edge
-	0x00005511, #  0000 0000 0000 0000 - 0101 0101 0001 0001 fall edge
-    ))
+# Character table of ASCII from 32..127 and extra characters 128..151,
+# 4 bytes (32 segments, big endian) per character
+_CH32 = const(
+	b'\x00\x00\x00\x00' #  0000 0000 0000 0000 - 0000 0000 0000 0000 (space)
+	b'\x40\x00\x01\x00' #  0100 0000 0000 0000 - 0000 0001 0000 0000 !
+	b'\x00\x00\x01\x80' #  0000 0000 0000 0000 - 0000 0001 1000 0000 "
+	b'\x00\x30\x55\x0C' #  0000 0000 0011 0000 - 0101 0101 0000 1100 #
+	b'\x00\x00\x55\xBB' #  0000 0000 0000 0000 - 0101 0101 1011 1011 $
+#	b'\x00\x00\x77\x99' #  0000 0000 0000 0000 - 0111 0111 1001 1001 %
+	b'\x00\x0A\x22\x99' #  0000 0000 0000 1010 - 0010 0010 1001 1001 %
+	b'\x00\x02\xC9\x61' #  0000 0000 0000 0010 - 1100 1001 0110 0001 &
+	b'\x00\x00\x02\x00' #  0000 0000 0000 0000 - 0000 0010 0000 0000 '
+	b'\x00\x0C\x00\x12' #  0000 0000 0000 1100 - 0000 0000 0001 0010 (
+	b'\x00\x03\x00\x21' #  0000 0000 0000 0011 - 0000 0000 0010 0001 )
+	b'\x00\x00\xFF\x00' #  0000 0000 0000 0000 - 1111 1111 0000 0000 *
+	b'\x00\x00\x55\x00' #  0000 0000 0000 0000 - 0101 0101 0000 0000 +
+	b'\x10\x00\x00\x00' #  0001 0000 0000 0000 - 0000 0000 0000 0000 ,
+	b'\x00\x00\x44\x00' #  0000 0000 0000 0000 - 0100 0100 0000 0000 -
+	b'\x20\x00\x00\x00' #  0010 0000 0000 0000 - 0000 0000 0000 0000 .
+	b'\x00\x00\x22\x00' #  0000 0000 0000 0000 - 0010 0010 0000 0000 /
+	b'\x00\x00\x22\xFF' #  0000 0000 0000 0000 - 0010 0010 1111 1111 0
+	b'\x00\x08\x11\x30' #  0000 0000 0000 1000 - 0001 0001 0011 0000 1
+	b'\x00\x00\x44\x77' #  0000 0000 0000 0000 - 0100 0100 0111 0111 2
+	b'\x00\x00\x44\x3F' #  0000 0000 0000 0000 - 0100 0100 0011 1111 3
+#	b'\x00\x00\x44\x8C' #  0000 0000 0000 0000 - 0100 0100 1000 1100 4
+	b'\x00\x08\x44\x0C' #  0000 0000 0000 1000 - 0100 0100 0000 1100 4
+	b'\x00\x00\x44\xBB' #  0000 0000 0000 0000 - 0100 0100 1011 1011 5
+#	b'\x00\x02\x44\xA3' #  0000 0000 0000 0010 - 0100 0100 1010 0011 5
+	b'\x00\x08\x44\x7A' #  0000 0000 0000 1000 - 0100 0100 0111 1010 6
+#	b'\x00\x00\x44\xFB' #  0000 0000 0000 0000 - 0100 0100 1111 1011 6
+	b'\x00\x00\x22\x03' #  0000 0000 0000 0000 - 0010 0010 0000 0011 7
+#	b'\x00\x00\x00\x0F' #  0000 0000 0000 0000 - 0000 0000 0000 1111 7
+	b'\x00\x00\x44\xFF' #  0000 0000 0000 0000 - 0100 0100 1111 1111 8
+	b'\x00\x00\x44\xBF' #  0000 0000 0000 0000 - 0100 0100 1011 1111 9
+	b'\xC0\x00\x00\x00' #  1100 0000 0000 0000 - 0000 0000 0000 0000 :
+	b'\x50\x00\x00\x00' #  0101 0000 0000 0000 - 0000 0000 0000 0000 ;
+	b'\x00\x0C\x00\x00' #  0000 0000 0000 1100 - 0000 0000 0000 0000 <
+	b'\x00\x30\x44\x00' #  0000 0000 0011 0000 - 0100 0100 0000 0000 =
+	b'\x00\x03\x00\x00' #  0000 0000 0000 0011 - 0000 0000 0000 0000 >
+	b'\x20\x00\x14\x07' #  0010 0000 0000 0000 - 0001 0100 0000 0111 ?
+
+	b'\x00\x00\x50\x7F' #  0000 0000 0000 0000 - 0101 0000 0111 1111 @
+#	b'\x00\x00\x44\xCF' #  0000 0000 0000 0000 - 0100 0100 1100 1111 A
+	b'\x00\x09\x44\x48' #  0000 0000 0000 1001 - 0100 0100 0100 1000 A
+	b'\x00\x00\x15\x3F' #  0000 0000 0000 0000 - 0001 0101 0011 1111 B
+	b'\x00\x00\x00\xF3' #  0000 0000 0000 0000 - 0000 0000 1111 0011 C
+	b'\x00\x00\x11\x3F' #  0000 0000 0000 0000 - 0001 0001 0011 1111 D
+	b'\x00\x00\x40\xF3' #  0000 0000 0000 0000 - 0100 0000 1111 0011 E
+	b'\x00\x00\x40\xC3' #  0000 0000 0000 0000 - 0100 0000 1100 0011 F
+	b'\x00\x00\x04\xFB' #  0000 0000 0000 0000 - 0000 0100 1111 1011 G
+#	b'\x00\x08\x04\x7A' #  0000 0000 0000 1000 - 0000 0100 0111 1010 G
+	b'\x00\x00\x44\xCC' #  0000 0000 0000 0000 - 0100 0100 1100 1100 H
+	b'\x00\x00\x11\x33' #  0000 0000 0000 0000 - 0001 0001 0011 0011 I
+	b'\x00\x00\x00\x7C' #  0000 0000 0000 0000 - 0000 0000 0111 1100 J
+	b'\x00\x00\x46\xC8' #  0000 0000 0000 0000 - 0100 0110 1100 1000 K
+#	b'\x00\x00\x4A\xC0' #  0000 0000 0000 0000 - 0100 1010 1100 0000 K
+	b'\x00\x00\x00\xF0' #  0000 0000 0000 0000 - 0000 0000 1111 0000 L
+	b'\x00\x00\x82\xCC' #  0000 0000 0000 0000 - 1000 0010 1100 1100 M
+	b'\x00\x00\x88\xCC' #  0000 0000 0000 0000 - 1000 1000 1100 1100 N
+	b'\x00\x00\x00\xFF' #  0000 0000 0000 0000 - 0000 0000 1111 1111 O
+	b'\x00\x00\x44\xC7' #  0000 0000 0000 0000 - 0100 0100 1100 0111 P
+	b'\x00\x00\x08\xFF' #  0000 0000 0000 0000 - 0000 1000 1111 1111 Q
+#	b'\x00\x0A\x08\x66' #  0000 0000 0000 1010 - 0000 1000 0110 0110 Q
+	b'\x00\x00\x4C\xC7' #  0000 0000 0000 0000 - 0100 1100 1100 0111 R
+#	b'\x00\x00\x44\xBB' #  0000 0000 0000 0000 - 0100 0100 1011 1011 S
+	b'\x00\x0A\x44\x22' #  0000 0000 0000 1010 - 0100 0100 0010 0010 S
+	b'\x00\x00\x11\x03' #  0000 0000 0000 0000 - 0001 0001 0000 0011 T
+	b'\x00\x00\x00\xFC' #  0000 0000 0000 0000 - 0000 0000 1111 1100 U
+	b'\x00\x06\x00\x84' #  0000 0000 0000 0110 - 0000 0000 1000 0100 V
+#	b'\x00\x00\x22\xC0' #  0000 0000 0000 0000 - 0010 0010 1100 0000 V
+	b'\x00\x00\x28\xCC' #  0000 0000 0000 0000 - 0010 1000 1100 1100 W
+	b'\x00\x00\xAA\x00' #  0000 0000 0000 0000 - 1010 1010 0000 0000 X
+	b'\x00\x00\x92\x00' #  0000 0000 0000 0000 - 1001 0010 0000 0000 Y
+	b'\x00\x00\x22\x33' #  0000 0000 0000 0000 - 0010 0010 0011 0011 Z
+	b'\x00\x00\x00\xE1' #  0000 0000 0000 0000 - 0000 0000 1110 0001 [
+	b'\x00\x00\x88\x00' #  0000 0000 0000 0000 - 1000 1000 0000 0000 (backslash)
+	b'\x00\x00\x00\x1E' #  0000 0000 0000 0000 - 0000 0000 0001 1110 ]
+	b'\x00\x09\x00\x00' #  0000 0000 0000 1001 - 0000 0000 0000 0000 ^
+	b'\x06\x00\x00\x00' #  0000 0110 0000 0000 - 0000 0000 0000 0000 _
+
+	b'\x00\x00\x80\x00' #  0000 0000 0000 0000 - 1000 0000 0000 0000 `	-> small letters
+	b'\x00\x00\x58\x60' #  0000 0000 0000 0000 - 0101 1000 0110 0000 a
+	b'\x00\x00\x44\xF8' #  0000 0000 0000 0000 - 0100 0100 1111 1000 b
+	b'\x00\x00\x44\x70' #  0000 0000 0000 0000 - 0100 0100 0111 0000 c
+	b'\x00\x00\x44\x7C' #  0000 0000 0000 0000 - 0100 0100 0111 1100 d
+	b'\x00\x80\x44\x70' #  0000 0000 1000 0000 - 0100 0100 0111 0000 e
+	b'\x00\x00\x55\x02' #  0000 0000 0000 0000 - 0101 0101 0000 0010 f
+	b'\x07\x00\x44\x78' #  0000 0111 0000 0000 - 0100 0100 0111 1000 g
+	b'\x00\x00\x44\xC8' #  0000 0000 0000 0000 - 0100 0100 1100 1000 h
+	b'\x80\x00\x50\x30' #  1000 0000 0000 0000 - 0101 0000 0011 0000 i
+	b'\x9C\x00\x50\x00' #  1001 1100 0000 0000 - 0101 0000 0000 0000 j
+	b'\x00\x40\x44\xC0' #  0000 0000 0100 0000 - 0100 0100 1100 0000 k
+	b'\x00\x08\x00\xE1' #  0000 0000 0000 1000 - 0000 0000 1110 0001 l
+#	b'\x00\x00\x11\x10' #  0000 0000 0000 0000 - 0001 0001 0001 0000 l
+	b'\x00\x00\x54\x48' #  0000 0000 0000 0000 - 0101 0100 0100 1000 m
+	b'\x00\x00\x44\x48' #  0000 0000 0000 0000 - 0100 0100 0100 1000 n
+	b'\x00\x00\x44\x78' #  0000 0000 0000 0000 - 0100 0100 0111 1000 o
+	b'\x08\x00\x44\x78' #  0000 1000 0000 0000 - 0100 0100 0111 1000 p
+	b'\x01\x00\x44\x78' #  0000 0001 0000 0000 - 0100 0100 0111 1000 q
+	b'\x00\x00\x24\x40' #  0000 0000 0000 0000 - 0010 0100 0100 0000 r
+	b'\x00\x40\x44\x30' #  0000 0000 0100 0000 - 0100 0100 0011 0000 s
+	b'\x00\x00\x40\xF0' #  0000 0000 0000 0000 - 0100 0000 1111 0000 t
+	b'\x00\x00\x00\x78' #  0000 0000 0000 0000 - 0000 0000 0111 1000 u
+	b'\x00\x06\x00\x00' #  0000 0000 0000 0110 - 0000 0000 0000 0000 v
+	b'\x00\x00\x28\x48' #  0000 0000 0000 0000 - 0010 1000 0100 1000 w
+	b'\x00\xC0\x00\x00' #  0000 0000 1100 0000 - 0000 0000 0000 0000 x
+	b'\x07\x04\x00\x18' #  0000 0111 0000 0100 - 0000 0000 0001 1000 y
+	b'\x00\x80\x44\x30' #  0000 0000 1000 0000 - 0100 0100 0011 0000 z
+	b'\x00\x00\x51\x12' #  0000 0000 0000 0000 - 0101 0001 0001 0010 {
+	b'\x00\x00\x11\x00' #  0000 0000 0000 0000 - 0001 0001 0000 0000 |
+	b'\x00\x00\x15\x21' #  0000 0000 0000 0000 - 0001 0101 0010 0001 }
+	b'\x00\x00\x05\x85' #  0000 0000 0000 0000 - 0000 0101 1000 0101 ~
+	b'\x00\x00\xFF\xFF' #  0000 0000 0000 0000 - 1111 1111 1111 1111 dummy
+
+	b'\x00\x38\x44\x00' #  0000 0000 0011 1000 - 0100 0100 0000 0000 <=
+	b'\x00\x31\x44\x00' #  0000 0000 0011 0001 - 0100 0100 0000 0000 >=
+	b'\x00\x00\x41\x81' #  0000 0000 0000 0000 - 0100 0001 1000 0001 °
+	b'\x00\x02\x48\x60' #  0000 0000 0000 0010 - 0100 1000 0110 0000 alpha
+	b'\x08\x08\x04\x5E' #  0000 1000 0000 1000 - 0000 0100 0101 1110 beta
+	b'\x00\x00\x00\xC3' #  0000 0000 0000 0000 - 0000 0000 1100 0011 GAMA
+	b'\x00\x00\x6C\x00' #  0000 0000 0000 0000 - 0110 1100 0000 0000 pi
+	b'\x00\x00\xA0\x33' #  0000 0000 0000 0000 - 1010 0000 0011 0011 SIGMA
+	b'\x08\x00\x10\x70' #  0000 1000 0000 0000 - 0001 0000 0111 0000 mi
+	b'\x00\x00\x54\x10' #  0000 0000 0000 0000 - 0101 0100 0001 0000 tau
+	b'\x00\x00\xC8\x71' #  0000 0000 0000 0000 - 1100 1000 0111 0001 delta
+	b'\x10\x00\x55\x78' #  0001 0000 0000 0000 - 0101 0101 0111 1000 fi
+	b'\x00\x00\xAA\x88' #  0000 0000 0000 0000 - 1010 1010 1000 1000 chi
+	b'\x00\x00\x28\x30' #  0000 0000 0000 0000 - 0010 1000 0011 0000 DELTA
+	b'\xC0\x00\x44\x00' #  1100 0000 0000 0000 - 0100 0100 0000 0000 fraction
+	b'\x07\x00\x44\xFB' #  0000 0111 0000 0000 - 0100 0100 1111 1011 paragraph
+	b'\x00\x0C\x0A\x00' #  0000 0000 0000 1100 - 0000 1010 0000 0000 <<
+	b'\x00\x03\xA0\x00' #  0000 0000 0000 0011 - 1010 0000 0000 0000 >>
+	b'\x00\x0C\x44\x00' #  0000 0000 0000 1100 - 0100 0100 0000 0000 <-
+	b'\x00\x03\x44\x00' #  0000 0000 0000 0011 - 0100 0100 0000 0000 ->
+	b'\x00\x09\x11\x00' #  0000 0000 0000 1001 - 0001 0001 0000 0000 UP
+	b'\x00\x06\x11\x00' #  0000 0000 0000 0110 - 0001 0001 0000 0000 DOWN
+	b'\x00\x00\x55\x22' #  0000 0000 0000 0000 - 0101 0101 0010 0010 rise edge
+	b'\x00\x00\x55\x11' #  0000 0000 0000 0000 - 0101 0101 0001 0001 fall edge
+	)
+
+# Unicode of the extra characters, sorted by code point: 2 bytes code point, 1 byte index
+_UNI32 = const(
+	b'\x00\xA7\x6F' # paragraph
+	b'\x00\xAB\x70' # <<
+	b'\x00\xB0\x62' # degree
+	b'\x00\xB5\x68' # micro
+	b'\x00\xBB\x71' # >>
+	b'\x00\xF7\x6E' # fraction
+	b'\x03\x93\x65' # GAMA
+	b'\x03\x94\x6D' # DELTA
+	b'\x03\xA3\x67' # SIGMA
+	b'\x03\xB1\x63' # alpha
+	b'\x03\xB2\x64' # beta
+	b'\x03\xB4\x6A' # delta
+	b'\x03\xBC\x68' # mi
+	b'\x03\xC0\x66' # pi
+	b'\x03\xC4\x69' # tau
+	b'\x03\xC6\x6B' # fi
+	b'\x03\xC7\x6C' # chi
+	b'\x21\x90\x72' # <-
+	b'\x21\x91\x74' # UP
+	b'\x21\x92\x73' # ->
+	b'\x21\x93\x75' # DOWN
+	b'\x22\x06\x6D' # increment (DELTA)
+	b'\x22\x64\x60' # <=
+	b'\x22\x65\x61' # >=
+	)
+
+# sin(alpha)*256 for alpha 0..89 degree
+_SIN256 = const(b'\x00\x04\x08\x0D\x11\x16\x1A\x1F\x23\x28\x2C\x30\x35\x39\x3D\x42\x46\x4A\x4F\x53\x57\x5B\x5F\x64\x68\x6C\x70\x74\x78\x7C\x80\x83\x87\x8B\x8F\x92\x96\x9A\x9D\xA1\xA4\xA7\xAB\xAE\xB1\xB5\xB8\xBB\xBE\xC1\xC4\xC6\xC9\xCC\xCF\xD1\xD4\xD6\xD9\xDB\xDD\xDF\xE2\xE4\xE6\xE8\xE9\xEB\xED\xEE\xF0\xF2\xF3\xF4\xF6\xF7\xF8\xF9\xFA\xFB\xFC\xFC\xFD\xFE\xFE\xFF\xFF\xFF\xFF\xFF')
+
+def isin(alpha):
+    '''
+    Sine of integer angle in degree, multiplied by 256
+    '''
+    alpha %= 360
+    if alpha >= 180:
+        return -isin(alpha - 180)
+    if alpha > 90:
+        alpha = 180 - alpha
+    if alpha == 90:
+        return 256
+    return _SIN256[alpha]
+
+def icos(alpha):
+    '''
+    Cosine of integer angle in degree, multiplied by 256
+    '''
+    return isin(alpha + 90)
 
 def rotation(points, alpha):
     '''
     Rotation of point or line around point [0,0]
     '''
-    coef = const(256)
-    s = int(coef * math.sin(math.pi*alpha/180))
-    c = int(coef * math.cos(math.pi*alpha/180))
     retVal = []
+    if (alpha % 90) == 0:
+        # exact right angles, no multiplication
+        alpha = int(alpha % 360) // 90
+        for i in range(0, len(points), 2):
+            if alpha == 0:
+                retVal.append(points[i])
+                retVal.append(points[i+1])
+            elif alpha == 1:
+                retVal.append(-points[i+1])
+                retVal.append(points[i])
+            elif alpha == 2:
+                retVal.append(-points[i])
+                retVal.append(-points[i+1])
+            else:
+                retVal.append(points[i+1])
+                retVal.append(-points[i])
+        return retVal
+    coef = const(256)
+    if isinstance(alpha, int):
+        s = isin(alpha)
+        c = icos(alpha)
+    else:
+        # fraction of degree
+        s = int(coef * math.sin(math.pi*alpha/180))
+        c = int(coef * math.cos(math.pi*alpha/180))
     for i in range(0, len(points), 2):
         retVal.append((c*points[i] - s*points[i+1]) // coef)
         retVal.append((s*points[i] + c*points[i+1]) // coef)
@@ -245,7 +325,475 @@ def adjust(segm, height, width):
     retVal.append(width*segm[2]//_SREF)
     retVal.append(height*segm[3]//_SREF)
     return retVal
-    
+
+def _decode32(code):
+    '''
+    Decode character code (4 bytes, big endian) to the segment indices (lines, dots).
+    Merged pairs of segments get the indices from 32 up (see _PAIRS).
+    '''
+    code = bytearray(code)
+    lines = bytearray()
+    dots = bytearray()
+    pair = 32
+    for i in range(32):
+        if code[3 - (i >> 3)] & (1 << (i & 7)):
+            j = i + _PAIRS[i]
+            if (_PAIRS[i]!=0) and (code[3 - (j >> 3)] & (1 << (j & 7))):
+                code[3 - (j >> 3)] ^= 1 << (j & 7)
+                lines.append(pair)
+            elif i >= 29:
+                dots.append(i)
+            else:
+                lines.append(i)
+        if _PAIRS[i]!=0:
+            pair += 1
+    return (bytes(lines), bytes(dots))
+
+# number of characters in _CH32
+_N32 = const(120)
+# user characters: codes (4 bytes each, index from _N32 up) and {code point: index}
+_user32 = bytearray()
+_USER32 = {}
+# decoded characters {index: (lines, dots)}, only the used ones
+_glyphs = {}
+# revision of user characters, increased when one is replaced
+_rev32 = 0
+
+def _glyph32(idx):
+    # segment indices (lines, dots) of character
+    g = _glyphs.get(idx)
+    if g is None:
+        if idx < _N32:
+            g = _decode32(_CH32[4*idx:4*idx + 4])
+        else:
+            g = _decode32(_user32[4*(idx - _N32):4*(idx - _N32) + 4])
+        _glyphs[idx] = g
+    return g
+
+def register32(ch, code):
+    '''
+    Add (or replace) a character of the 32-segment font.
+    code - 32 bits of segments like in _CH32, as int or 4 bytes (big endian)
+    '''
+    global _rev32
+    if isinstance(code, int):
+        code = struct.pack('>I', code)
+    idx = _USER32.get(ord(ch))
+    if idx is None:
+        _USER32[ord(ch)] = _N32 + len(_user32)//4
+        _user32.extend(code)
+        return
+    # the same slot, decoded segments and areas of the old code are dropped
+    i = 4*(idx - _N32)
+    _user32[i:i + 4] = code
+    _glyphs.pop(idx, None)
+    _rev32 += 1
+
+# position against the clip rectangle
+_INSIDE = const(0)
+_PARTLY = const(1)
+_OUTSIDE = const(2)
+
+# atlas index of one character: x, y offset, width, height, bitmap offset
+_ATLAS_INDEX = const('<hhBBI')
+
+def _mono_palette(c):
+    # palette of MONO_HLSB glyphs maps 0 -> key (transparent), 1 -> color
+    key = 1 if c == 0 else 0
+    pal = FrameBuffer(bytearray(4), 2, 1, RGB565)
+    pal.pixel(0, 0, key)
+    pal.pixel(1, 0, c)
+    return pal, key
+
+def _index32(ch):
+    # index of character in _CH32 (or user character), dummy for unknown
+    c = ord(ch)
+    if _USER32:
+        idx = _USER32.get(c)
+        if idx is not None:
+            return idx
+    if 32 <= c < 32 + _N32:
+        return c - 32
+    # binary search of Unicode
+    lo = 0
+    hi = len(_UNI32)//3
+    while lo < hi:
+        m = (lo + hi) >> 1
+        u = (_UNI32[3*m] << 8) | _UNI32[3*m + 1]
+        if u == c:
+            return _UNI32[3*m + 2]
+        if u < c:
+            lo = m + 1
+        else:
+            hi = m
+    return 95 # (127 - 32)
+
+class LRUCache():
+    '''
+    Least recently used cache with a budget in bytes.
+    Each item is stored together with its size; the oldest items
+    are evicted when the sum of sizes exceeds the budget.
+    evicted - optional function(key) called for each evicted item
+    '''
+    def __init__(self, budget=2048, evicted=None):
+        self.budget = budget
+        self.evicted = evicted
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        item = self._items.pop(key, None)
+        if item is None:
+            self.misses += 1
+            return None
+        # re-insert as the most recently used
+        self._items[key] = item
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, value, size):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.used -= old[1]
+        if size > self.budget:
+            return
+        while self.used + size > self.budget:
+            oldest = next(iter(self._items))
+            self.used -= self._items.pop(oldest)[1]
+            if self.evicted is not None:
+                self.evicted(oldest)
+        self._items[key] = (value, size)
+        self.used += size
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def remove(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.used -= item[1]
+
+    def clear(self):
+        self._items = OrderedDict()
+        self.used = 0
+
+    def stats(self):
+        '''
+        Returns (hits, misses, items, used bytes)
+        '''
+        return (self.hits, self.misses, len(self._items), self.used)
+
+def _merge_rect(rects, r, limit):
+    '''
+    Add rectangle [x1, y1, x2, y2] to list of rectangles, joining it with all
+    overlapping or touching ones. Above the limit the nearest are joined.
+    '''
+    i = 0
+    while i < len(rects):
+        q = rects[i]
+        if q[0] <= r[2] and r[0] <= q[2] and q[1] <= r[3] and r[1] <= q[3]:
+            r = [min(q[0], r[0]), min(q[1], r[1]), max(q[2], r[2]), max(q[3], r[3])]
+            rects.pop(i)
+            i = 0
+        else:
+            i += 1
+    if len(rects) >= limit:
+        # join with the rectangle with the smallest growth of area
+        best = 0
+        growth = None
+        for i in range(len(rects)):
+            q = rects[i]
+            g = (max(q[2], r[2]) - min(q[0], r[0])) * (max(q[3], r[3]) - min(q[1], r[1])) \
+                - (q[2] - q[0]) * (q[3] - q[1])
+            if growth is None or g < growth:
+                best = i
+                growth = g
+        q = rects.pop(best)
+        _merge_rect(rects, [min(q[0], r[0]), min(q[1], r[1]), max(q[2], r[2]), max(q[3], r[3])], limit)
+        return
+    rects.append(r)
+
+def _buf_size(w, h, format):
+    # bytes enough for FrameBuffer of any format (up to 4 bits per pixel rounded to 8x8)
+    if format == RGB565:
+        return 2 * w * h
+    if format == GS8:
+        return w * h
+    return ((w + 7) & ~7) * ((h + 7) & ~7) // 2
+
+class FBImage():
+    '''
+    Image in FrameBuffer format ready for blit().
+    Optional palette (FrameBuffer with one row) converts pixel values to colors.
+    '''
+    def __init__(self, buf, width, height, format, stride=None, palette=None):
+        if stride is None:
+            stride = width
+        self.buf = buf
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = stride
+        self.palette = palette
+        self.fbuf = FrameBuffer(buf, width, height, format, stride)
+
+    def pixel(self, x, y):
+        c = self.fbuf.pixel(x, y)
+        if self.palette is not None:
+            c = self.palette.pixel(c, 0)
+        return c
+
+    def get_pixels(self):
+        '''
+        Returns 2D array of colors pixels[y][x]
+        '''
+        pixels = []
+        for y in range(self.height):
+            pixels.append([self.pixel(x, y) for x in range(self.width)])
+        return pixels
+
+    def rotate(self, rotation):
+        '''
+        Returns new FBImage rotated clockwise by rotation*90 degree.
+        MONO_HLSB images are rotated by 8x8 pixel tiles,
+        GS8 and RGB565 by direct access to buffer.
+        '''
+        rotation &= 3
+        w = self.width
+        h = self.height
+        if rotation == ROT_0_DEG:
+            return FBImage(bytearray(self.buf), w, h, self.format, self.stride, self.palette)
+        if rotation != ROT_180_DEG:
+            w, h = h, w
+        if self.format == MONO_HLSB:
+            stride = (w + 7) & ~7
+            buf = bytearray((stride >> 3) * h)
+            _rotate_mono(self.buf, (self.stride + 7) >> 3, self.width, self.height, buf, stride >> 3, rotation)
+        elif self.format == GS8 or self.format == RGB565:
+            stride = w
+            e = 1 if self.format == GS8 else 2
+            buf = bytearray(e * w * h)
+            _rotate_bytes(self.buf, self.stride * e, self.width, self.height, buf, w * e, e, rotation)
+        else:
+            # other formats (up to 4 bits per pixel) by pixels
+            stride = w
+            buf = bytearray(_buf_size(w, h, self.format))
+            fbuf = FrameBuffer(buf, w, h, self.format)
+            for y in range(self.height):
+                for x in range(self.width):
+                    c = self.fbuf.pixel(x, y)
+                    if rotation == ROT_90_DEG:
+                        fbuf.pixel(w-1-y, x, c)
+                    elif rotation == ROT_180_DEG:
+                        fbuf.pixel(w-1-x, h-1-y, c)
+                    else:
+                        fbuf.pixel(y, h-1-x, c)
+        return FBImage(buf, w, h, self.format, stride, self.palette)
+
+class PixelGrid():
+    '''
+    2D array of pixels in one buffer, pixels[y][x] like a list of lists.
+    typecode - 'B' (8 bit pixels, buf is bytearray) or 'H' (16 bit, array)
+    Rows are memoryviews of the buffer, e.g. pixels[y][x0:x1] = row
+    '''
+    def __init__(self, width, height, typecode='B'):
+        self.width = width
+        self.height = height
+        self.typecode = typecode
+        self.size = 1 if typecode == 'B' else 2
+        self.stride = width
+        if typecode == 'B':
+            self.buf = bytearray(width * height)
+        else:
+            self.buf = array(typecode, bytes(self.size * width * height))
+        self._mv = memoryview(self.buf)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError
+        return self._mv[y * self.stride:y * self.stride + self.width]
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield self._mv[y * self.stride:y * self.stride + self.width]
+
+    def image(self):
+        '''
+        FBImage of the pixels: GS8 sharing the buffer ('B'), RGB565 ('H', bytes
+        of the buffer) or MONO_HLSB for values 0 and 1
+        '''
+        if max(self.buf) <= 1:
+            return pixels_to_image(self)
+        if self.size == 1:
+            return FBImage(self.buf, self.width, self.height, GS8)
+        return FBImage(bytearray(self.buf), self.width, self.height, RGB565)
+
+def pixels_to_image(pixels):
+    '''
+    Pack 2D array of pixels[y][x] to FBImage in the smallest suitable format:
+    MONO_HLSB (values 0, 1), GS8 (up to 255) or RGB565 (up to 0xFFFF).
+    Returns None for other values.
+    '''
+    h = len(pixels)
+    w = len(pixels[0])
+    if min(min(row) for row in pixels) < 0:
+        return None
+    top = max(max(row) for row in pixels)
+    if top <= 1:
+        stride = (w + 7) >> 3
+        buf = bytearray(stride * h)
+        ob = 0
+        for row in pixels:
+            for x in range(w):
+                if row[x]:
+                    buf[ob + (x >> 3)] |= 0x80 >> (x & 7)
+            ob += stride
+        return FBImage(buf, w, h, MONO_HLSB)
+    if top <= 0xFF:
+        buf = bytearray(w * h)
+        for y in range(h):
+            buf[y*w:(y+1)*w] = bytes(pixels[y])
+        return FBImage(buf, w, h, GS8)
+    if top <= 0xFFFF:
+        buf = bytearray(2 * w * h)
+        for y in range(h):
+            buf[2*y*w:2*(y+1)*w] = array('H', pixels[y])
+        return FBImage(buf, w, h, RGB565)
+    return None
+
+# bit reverse of bytes, created with the first 180 degree rotation
+_rev8 = None
+
+def _transpose8(r):
+    '''
+    Transpose of 8x8 bit tile in 8 bytes, MSB is the left pixel
+    '''
+    for i in (0, 1, 2, 3):
+        a = r[i]
+        b = r[i+4]
+        r[i] = (a & 0xF0) | (b >> 4)
+        r[i+4] = ((a << 4) & 0xF0) | (b & 0x0F)
+    for i in (0, 1, 4, 5):
+        a = r[i]
+        b = r[i+2]
+        r[i] = (a & 0xCC) | ((b >> 2) & 0x33)
+        r[i+2] = ((a << 2) & 0xCC) | (b & 0x33)
+    for i in (0, 2, 4, 6):
+        a = r[i]
+        b = r[i+1]
+        r[i] = (a & 0xAA) | ((b >> 1) & 0x55)
+        r[i+1] = ((a << 1) & 0xAA) | (b & 0x55)
+
+def _rotate_mono(src, ss, w, h, dst, ds, rotation):
+    '''
+    Rotation of MONO_HLSB buffer (w x h, stride ss bytes)
+    into dst with stride ds bytes
+    '''
+    global _rev8
+    if rotation == ROT_180_DEG:
+        if _rev8 is None:
+            _rev8 = bytearray(256)
+            for i in range(256):
+                for b in range(8):
+                    if i & (1 << b):
+                        _rev8[i] |= 0x80 >> b
+        n = (w + 7) >> 3
+        shift = 8*n - w
+        rev = bytearray(n + 1)
+        for y in range(h):
+            so = y * ss
+            for i in range(n):
+                rev[i] = _rev8[src[so + n - 1 - i]]
+            do = (h - 1 - y) * ds
+            for i in range(ds):
+                dst[do + i] = ((rev[i] << shift) | (rev[i+1] >> (8 - shift))) & 0xFF
+        return
+    r = bytearray(8)
+    for k in range(ds):
+        for bx in range((w + 7) >> 3):
+            # 8 source rows of tile
+            for j in range(8):
+                if rotation == ROT_90_DEG:
+                    y = h - 1 - 8*k - j
+                else:
+                    y = 8*k + j
+                r[j] = src[y*ss + bx] if 0 <= y < h else 0
+            _transpose8(r)
+            x = 8 * bx
+            for i in range(min(8, w - x)):
+                if rotation == ROT_90_DEG:
+                    dst[(x+i)*ds + k] = r[i]
+                else:
+                    dst[(w-1-x-i)*ds + k] = r[i]
+
+def _rotate_bytes(src, ss, w, h, dst, ds, e, rotation):
+    '''
+    Rotation of buffer with e bytes per pixel (w x h, stride ss bytes)
+    into dst with stride ds bytes
+    '''
+    for y in range(h):
+        so = y * ss
+        if rotation == ROT_180_DEG:
+            do = (h-1-y)*ds + (w-1)*e
+            step = -e
+        elif rotation == ROT_90_DEG:
+            do = (h-1-y)*e
+            step = ds
+        else:
+            do = (w-1)*ds + y*e
+            step = -ds
+        if e == 1:
+            for x in range(w):
+                dst[do] = src[so + x]
+                do += step
+        else:
+            for x in range(0, 2*w, 2):
+                dst[do] = src[so + x]
+                dst[do+1] = src[so + x + 1]
+                do += step
+
+def _circle_octant(r, out):
+    '''
+    Points (x, y) of one octant of circle (midpoint algorithm) into
+    array out, returns the number of values
+    '''
+    f = 1 - r
+    ddF_x = 1
+    ddF_y = -2 * r
+    x = 0
+    y = r
+    n = 0
+    while x < y:
+        if f >= 0:
+            y -= 1
+            ddF_y += 2
+            f += ddF_y
+        x += 1
+        ddF_x += 2
+        f += ddF_x
+        out[n] = x
+        out[n+1] = y
+        n += 2
+    return n
+
+try:
+    # viper variants of the loops above (native code emitter only)
+    from fb_viper import rotate_mono as _rotate_mono, rotate_bytes as _rotate_bytes, \
+        circle_octant as _circle_octant
+except:
+    # CPython or port without viper
+    pass
+
 class FrBuffExpansion():
     '''
     Expansion of FrameBuffer class methods
@@ -258,10 +806,199 @@ class FrBuffExpansion():
         self.angle = 0
         self.shift = 2*self.width + self.bold + 2
         self.fb = None
+        self.fb_width = None
+        self.fb_height = None
+        self.fb_format = None
+        self.glyph_cache = None
+        self._hexagon = array('h', bytes(24))
+        self._nodes = array('h', bytes(24))
+        self._layers = []
+        self._hooked = []
+        self._dirty = []
+        self._dirty_max = 8
+        self._clip = None
+        self._compile32()
 
     def get_fb(self):
         return self.fb
 
+    def _set_hooks(self, layer, hooks):
+        '''
+        Install (or remove by hooks=None) one layer of method wrappers.
+        hooks is dict {method name: function(method) returning wrapper}.
+        Wrappers are instance attributes over the class methods, so there
+        is no cost at all without any layer.
+        '''
+        layers = [l for l in self._layers if l[0] != layer]
+        if hooks is not None:
+            layers.append((layer, hooks))
+        for name in self._hooked:
+            delattr(self, name)
+        self._hooked = []
+        for l in layers:
+            for name in l[1]:
+                setattr(self, name, l[1][name](getattr(self, name)))
+                if name not in self._hooked:
+                    self._hooked.append(name)
+        self._layers = layers
+
+    def _screen(self):
+        # whole FrameBuffer (or very big area if the size is unknown)
+        return (0, 0, self.fb_width or 0x7FFF, self.fb_height or 0x7FFF)
+
+    def track_dirty(self, enable=True, max_rects=8):
+        '''
+        Start (or stop) tracking of areas changed by drawing methods.
+        Areas are merged into at most max_rects rectangles.
+        '''
+        self._dirty = []
+        self._dirty_max = max_rects
+        if enable:
+            hooks = {}
+            for name in _EXTENTS:
+                hooks[name] = self._dirty_hook(_EXTENTS[name])
+            self._set_hooks('dirty', hooks)
+        else:
+            self._set_hooks('dirty', None)
+
+    def _dirty_hook(self, extent):
+        def hook(method):
+            def wrapper(*args, **kwargs):
+                r = extent(self, *args, **kwargs)
+                if r is not None:
+                    self.add_dirty(r[0], r[1], r[2], r[3])
+                return method(*args, **kwargs)
+            return wrapper
+        return hook
+
+    def add_dirty(self, x, y, w, h):
+        '''
+        Mark area as changed, e.g. after direct drawing to FrameBuffer
+        '''
+        x2 = x + w
+        y2 = y + h
+        x = max(x, 0)
+        y = max(y, 0)
+        if self.fb_width is not None:
+            x2 = min(x2, self.fb_width)
+        if self.fb_height is not None:
+            y2 = min(y2, self.fb_height)
+        if x < x2 and y < y2:
+            _merge_rect(self._dirty, [x, y, x2, y2], self._dirty_max)
+
+    def dirty_rects(self, align=1):
+        '''
+        List of changed areas as (x, y, w, h).
+        With align=8 x and width are multiples of 8 (e-paper RAM window).
+        '''
+        rects = []
+        for r in self._dirty:
+            x2 = (r[2] + align - 1) // align * align
+            if self.fb_width is not None:
+                x2 = min(x2, self.fb_width)
+            _merge_rect(rects, [r[0] - r[0] % align, r[1], x2, r[3]], len(self._dirty))
+        return [(r[0], r[1], r[2] - r[0], r[3] - r[1]) for r in rects]
+
+    def reset_dirty(self):
+        self._dirty = []
+
+    def set_clip(self, x=None, y=None, w=None, h=None):
+        '''
+        Limit drawing of hexagonI4, circle, fill_circle, putText32,
+        putTextAtlas, drawText32 and img to the rectangle, set_clip() removes
+        the limit. Shapes outside are rejected before any other computation,
+        shapes partly inside are drawn by clipped spans.
+        '''
+        if x is None:
+            self._clip = None
+        else:
+            self._clip = (x, y, x + w, y + h)
+
+    def _clipped(self, x1, y1, x2, y2):
+        # position of area (inclusive) against the clip: _INSIDE, _PARTLY or _OUTSIDE
+        k = self._clip
+        if k is None:
+            return _INSIDE
+        if x1 >= k[2] or y1 >= k[3] or x2 < k[0] or y2 < k[1]:
+            return _OUTSIDE
+        if x1 >= k[0] and y1 >= k[1] and x2 < k[2] and y2 < k[3]:
+            return _INSIDE
+        return _PARTLY
+
+    def _point(self, x, y, c):
+        k = self._clip
+        if k is None or (k[0] <= x < k[2] and k[1] <= y < k[3]):
+            self.fb.pixel(x, y, c)
+
+    def _hspan(self, x, y, w, c):
+        k = self._clip
+        if k is not None:
+            if y < k[1] or y >= k[3]:
+                return
+            if x < k[0]:
+                w -= k[0] - x
+                x = k[0]
+            w = min(w, k[2] - x)
+            if w <= 0:
+                return
+        self.fb.hline(x, y, w, c)
+
+    def _vspan(self, x, y, h, c):
+        k = self._clip
+        if k is not None:
+            if x < k[0] or x >= k[2]:
+                return
+            if y < k[1]:
+                h -= k[1] - y
+                y = k[1]
+            h = min(h, k[3] - y)
+            if h <= 0:
+                return
+        self.fb.vline(x, y, h, c)
+
+    def _line(self, x1, y1, x2, y2, c):
+        # Bresenham line of FrameBuffer by clipped points
+        dx = x2 - x1
+        sx = 1 if dx > 0 else -1
+        dx = abs(dx)
+        dy = y2 - y1
+        sy = 1 if dy > 0 else -1
+        dy = abs(dy)
+        steep = dy > dx
+        if steep:
+            x1, y1 = y1, x1
+            dx, dy = dy, dx
+            sx, sy = sy, sx
+        e = 2*dy - dx
+        for i in range(dx):
+            if steep:
+                self._point(y1, x1, c)
+            else:
+                self._point(x1, y1, c)
+            while e >= 0:
+                y1 += sy
+                e -= 2*dx
+            x1 += sx
+            e += 2*dy
+        self._point(x2, y2, c)
+
+    def _blit(self, k, src, x, y, w, h, format, key, palette):
+        # blit of src (w x h) placed _INSIDE or _PARTLY in the clip
+        if k == _INSIDE:
+            self.fb.blit(src, x, y, key, palette)
+            return
+        # only the part inside the clip through a scratch FrameBuffer
+        k = self._clip
+        x1 = max(x, k[0])
+        y1 = max(y, k[1])
+        w = min(x + w, k[2]) - x1
+        h = min(y + h, k[3]) - y1
+        if w <= 0 or h <= 0:
+            return
+        part = FrameBuffer(bytearray(_buf_size(w, h, format)), w, h, format)
+        part.blit(src, x - x1, y - y1)
+        self.fb.blit(part, x1, y1, key, palette)
+
     # wrappers
     def fill(self, c):
         self.fb.fill(c)
@@ -310,6 +1047,10 @@ class FrBuffExpansion():
         self.fb.scroll(xstep, ystep)
 
     def blit(self, fbuf, x, y, key=-1, palette=None):
+        if not isinstance(fbuf, FrameBuffer):
+            # wrapper of source can be passed, its size is known for dirty
+            # tracking, profiling proxy of FrameBuffer is unwrapped too
+            fbuf = _blit_source(fbuf)
         self.fb.blit(fbuf, x, y, key, palette)
     # end of wrappers
 
@@ -317,42 +1058,131 @@ class FrBuffExpansion():
         '''
         Hexagon drawing function. Will draw a filled hexagon like segments in 7-seg. displays
         two points x1, y1 and x2, y2 and the width + color.
+        The six vertices are computed once in fixed point and filled by one
+        poly call (or scanlines of hline with old FrameBuffer).
+        Compared to the former sweep of 2*(b-1)+1 lines, edge pixels can
+        differ by 1 pixel (rounding of vertices to integer coordinates).
         '''
         if (b < 1):
             return
-        self.fb.line(x1,y1,x2,y2,c)
-        if (b > 1):
-            dy=y2-y1
-            dx=x2-x1
-            dl = math.sqrt(dx*dx + dy*dy)
-            dx = dx/dl
-            dy = dy/dl
-            if (b%2)==0:
-                x1 += 0.5*dy
-                x2 += 0.5*dy
-                y1 += 0.5*dx
-                y2 += 0.5*dx
-                
-            '''
-            dl = abs(dx) + abs(dy)
-            dl *= dl
-            b = round(b*dl)
-            dx = dx/dl
-            dy = dy/dl
-            '''
-            for i in range(1,b):
-                x1a = round(x1 + i*(dx+dy)/2)
-                x2a = round(x2 - i*(dx-dy)/2)
-                y1a = round(y1 + i*(dy-dx)/2)
-                y2a = round(y2 - i*(dy+dx)/2)
-                
-                x1b = round(x1 + i*(dx-dy)/2)
-                x2b = round(x2 - i*(dx+dy)/2)
-                y1b = round(y1 + i*(dy+dx)/2)
-                y2b = round(y2 - i*(dy-dx)/2)
-
-                self.fb.line(x1a,y1a,x2a,y2a,c)
-                self.fb.line(x1b,y1b,x2b,y2b,c)
+        if (b == 1):
+            k = self._clipped(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+            if k == _INSIDE:
+                self.fb.line(x1,y1,x2,y2,c)
+            elif k == _PARTLY:
+                self._line(x1,y1,x2,y2,c)
+            return
+        if self._clip is not None:
+            # trivial reject by the bounding box of the segment
+            m = b//2 + 1
+            k = self._clipped(min(x1, x2) - m, min(y1, y2) - m, max(x1, x2) + m, max(y1, y2) + m)
+            if k == _OUTSIDE:
+                return
+            if k == _PARTLY:
+                self._fill_poly(self._hexagon_points(x1,y1,x2,y2,b), c)
+                return
+        p = self._hexagon_points(x1,y1,x2,y2,b)
+        try:
+            self.fb.poly(0, 0, p, c, True)
+        except:
+            # old FrameBuffer
+            self._fill_poly(p, c)
+
+    def _hexagon_points(self, x1,y1,x2,y2,b):
+        # six vertices of hexagonI4 (b > 1) into self._hexagon
+        dx = x2-x1
+        dy = y2-y1
+        # length in 1/16 px, Newton iterations start above the root
+        n = (dx*dx + dy*dy) << 8
+        dl = (abs(dx) + abs(dy)) << 4
+        if dl:
+            r = (dl + n//dl) >> 1
+            while r < dl:
+                dl = r
+                r = (dl + n//dl) >> 1
+            # half of width along and across the line (1/256 px)
+            ex = ((b-1)*dx << 11)//dl
+            ey = ((b-1)*dy << 11)//dl
+        else:
+            dl = 1
+            ex = ey = 0
+        # centre point in 1/256 px, even width is shifted by half pixel
+        x1 <<= 8
+        y1 <<= 8
+        x2 <<= 8
+        y2 <<= 8
+        if (b%2)==0:
+            x1 += (dy << 11)//dl
+            x2 += (dy << 11)//dl
+            y1 += (dx << 11)//dl
+            y2 += (dx << 11)//dl
+        x1 += 128
+        y1 += 128
+        x2 += 128
+        y2 += 128
+        p = self._hexagon
+        p[0] = x1 >> 8
+        p[1] = y1 >> 8
+        p[2] = (x1 + ex + ey) >> 8
+        p[3] = (y1 + ey - ex) >> 8
+        p[4] = (x2 - ex + ey) >> 8
+        p[5] = (y2 - ey - ex) >> 8
+        p[6] = x2 >> 8
+        p[7] = y2 >> 8
+        p[8] = (x2 - ex - ey) >> 8
+        p[9] = (y2 - ey + ex) >> 8
+        p[10] = (x1 + ex - ey) >> 8
+        p[11] = (y1 + ey + ex) >> 8
+        return p
+
+    def _fill_poly(self, p, c):
+        '''
+        Scanline fill of polygon by hline, the same rules as FrameBuffer.poly
+        '''
+        n = len(p)
+        y_min = y_max = p[1]
+        for i in range(3, n, 2):
+            y_min = min(y_min, p[i])
+            y_max = max(y_max, p[i])
+        if self._clip is not None:
+            y_min = max(y_min, self._clip[1])
+            y_max = min(y_max, self._clip[3] - 1)
+        nodes = self._nodes
+        for row in range(y_min, y_max+1):
+            k = 0
+            px1 = p[0]
+            py1 = p[1]
+            for i in range(n-2, -1, -2):
+                px2 = p[i]
+                py2 = p[i+1]
+                if (py1 != py2) and ((py1 > row) != (py2 > row)):
+                    # edge crossing with rounding of C integer division
+                    t = 32*(px2-px1)*(row-py1)
+                    if (t < 0) != (py2-py1 < 0):
+                        t = -(abs(t)//abs(py2-py1))
+                    else:
+                        t = abs(t)//abs(py2-py1)
+                    t += 32*px1 + 16
+                    nodes[k] = t//32 if t >= 0 else -(-t//32)
+                    k += 1
+                elif row == max(py1, py2):
+                    # local minimum or horizontal edge
+                    if py1 == py2:
+                        self._hspan(min(px1, px2), row, abs(px2-px1)+1, c)
+                    else:
+                        self._point(px1 if py1 > py2 else px2, row, c)
+                px1 = px2
+                py1 = py2
+            # sort nodes from left to right
+            for i in range(1, k):
+                t = nodes[i]
+                j = i
+                while j > 0 and nodes[j-1] > t:
+                    nodes[j] = nodes[j-1]
+                    j -= 1
+                nodes[j] = t
+            for i in range(0, k-1, 2):
+                self._hspan(nodes[i], row, nodes[i+1]-nodes[i]+1, c)
 
     def circle(self, x0, y0, r, c, f=False):
         '''
@@ -360,68 +1190,60 @@ class FrBuffExpansion():
         with center at (x0, y0) and the specified radius (r) + color (c).
         For filling circle use the flag (f) = True
         '''
+        if f:
+            self.fill_circle(x0, y0, r, c)
+            return
+        k = self._clipped(x0 - r, y0 - r, x0 + r, y0 + r)
+        if k == _OUTSIDE:
+            return
         try:
             # try to use FrameBuffer function
+            if k == _PARTLY:
+                raise ValueError
             self.fb.ellipse(x0, y0, r, r, c, f)
         except:
-            # old FrameBuffer
-            if f:
-                self.fill_circle(x0, y0, r, c)
-                return
-            f = 1 - r
-            ddF_x = 1
-            ddF_y = -2 * r
-            x = 0
-            y = r
-            self.fb.pixel(x0, y0 + r, c)
-            self.fb.pixel(x0, y0 - r, c)
-            self.fb.pixel(x0 + r, y0, c)
-            self.fb.pixel(x0 - r, y0, c)
-            while x < y:
-                if f >= 0:
-                    y -= 1
-                    ddF_y += 2
-                    f += ddF_y
-                x += 1
-                ddF_x += 2
-                f += ddF_x
-                self.fb.pixel(x0 + x, y0 + y, c)
-                self.fb.pixel(x0 - x, y0 + y, c)
-                self.fb.pixel(x0 + x, y0 - y, c)
-                self.fb.pixel(x0 - x, y0 - y, c)
-                self.fb.pixel(x0 + y, y0 + x, c)
-                self.fb.pixel(x0 - y, y0 + x, c)
-                self.fb.pixel(x0 + y, y0 - x, c)
-                self.fb.pixel(x0 - y, y0 - x, c)
+            # old FrameBuffer (or clipped circle), the same pixels as ellipse
+            self._point(x0, y0 + r, c)
+            self._point(x0, y0 - r, c)
+            self._point(x0 + r, y0, c)
+            self._point(x0 - r, y0, c)
+            p = array('h', bytes(4*max(r, 0) + 4))
+            for i in range(0, _circle_octant(r, p), 2):
+                x = p[i]
+                y = p[i+1]
+                self._point(x0 + x, y0 + y, c)
+                self._point(x0 - x, y0 + y, c)
+                self._point(x0 + x, y0 - y, c)
+                self._point(x0 - x, y0 - y, c)
+                self._point(x0 + y, y0 + x, c)
+                self._point(x0 - y, y0 + x, c)
+                self._point(x0 + y, y0 - x, c)
+                self._point(x0 - y, y0 - x, c)
             
     def fill_circle(self, x0, y0, r, c):
         '''
         Filled circle drawing function. Will draw a filled circle with
         center at (x0, y0) and the specified radius (r) + color (c).
         '''
+        k = self._clipped(x0 - r, y0 - r, x0 + r, y0 + r)
+        if k == _OUTSIDE:
+            return
         try:
             # try to use FrameBuffer function
+            if k == _PARTLY:
+                raise ValueError
             self.fb.ellipse(x0, y0, r, r, c, True)
         except:
-            # old FrameBuffer
-            self.fb.vline(x0, y0 - r, 2*r + 1, c)
-            f = 1 - r
-            ddF_x = 1
-            ddF_y = -2 * r
-            x = 0
-            y = r
-            while x < y:
-                if f >= 0:
-                    y -= 1
-                    ddF_y += 2
-                    f += ddF_y
-                x += 1
-                ddF_x += 2
-                f += ddF_x
-                self.fb.vline(x0 + x, y0 - y, 2*y + 1, c)
-                self.fb.vline(x0 + y, y0 - x, 2*x + 1, c)
-                self.fb.vline(x0 - x, y0 - y, 2*y + 1, c)
-                self.fb.vline(x0 - y, y0 - x, 2*x + 1, c)
+            # old FrameBuffer (or clipped circle), the same pixels as ellipse
+            self._vspan(x0, y0 - r, 2*r + 1, c)
+            p = array('h', bytes(4*max(r, 0) + 4))
+            for i in range(0, _circle_octant(r, p), 2):
+                x = p[i]
+                y = p[i+1]
+                self._vspan(x0 + x, y0 - y, 2*y + 1, c)
+                self._vspan(x0 + y, y0 - x, 2*x + 1, c)
+                self._vspan(x0 - x, y0 - y, 2*y + 1, c)
+                self._vspan(x0 - y, y0 - x, 2*x + 1, c)
 
     def setText32(self, height=None, width=None, bold=None, angle=None, gap=1):
         '''
@@ -436,73 +1258,440 @@ class FrBuffExpansion():
         if angle!=None:
             self.angle = angle
         self.shift = 2*self.width + self.bold + gap
-        
+        self._compile32()
+
+    def _compile32(self):
+        '''
+        Precompute final segment lines for current text parameters:
+        the 32 segments followed by merged pairs, dot size and advance
+        '''
+        geo = []
+        for i in range(32):
+            geo.append(tuple(rotation(adjust(_SEGM[i], self.height, self.width), self.angle)))
+        for i in range(32):
+            if _PAIRS[i]!=0:
+                line = (_SEGM[i][0], _SEGM[i][1], _SEGM[i+_PAIRS[i]][2], _SEGM[i+_PAIRS[i]][3])
+                geo.append(tuple(rotation(adjust(line, self.height, self.width), self.angle)))
+        self._geo = tuple(geo)
+        self._dot = 2*self.bold//3
+        if self._dot == 0:
+            self._dot = 1
+        self._adv = tuple(rotation([self.shift, 0], self.angle))
+        # exact areas of characters, see _glyph_box()
+        self._gbox = {}
+        self._rev32 = _rev32
+        self._compiled = (self.height, self.width, self.bold, self.angle, self.shift)
+
+    def _check32(self):
+        # parameters assigned directly instead of setText32, compile them now
+        if self._compiled != (self.height, self.width, self.bold, self.angle, self.shift):
+            self._compile32()
+
+    def _glyph_box(self, idx):
+        '''
+        Exact area of drawn character around its centre (x1, y1, x2, y2)
+        from the vertices of its hexagons and dots, None for space
+        '''
+        if self._rev32 != _rev32:
+            # user character replaced, its area and cached bitmaps are stale
+            self._rev32 = _rev32
+            self._gbox = {}
+            if self.glyph_cache is not None:
+                self.glyph_cache.clear()
+        box = self._gbox.get(idx)
+        if box is None:
+            glyph = _glyph32(idx)
+            x1 = y1 = 0x7FFF
+            x2 = y2 = -0x7FFF
+            for i in glyph[0]:
+                line = self._geo[i]
+                if self.bold > 1:
+                    p = self._hexagon_points(line[0], line[1], line[2], line[3], self.bold)
+                else:
+                    p = line
+                for j in range(0, len(p), 2):
+                    x1 = min(x1, p[j])
+                    y1 = min(y1, p[j+1])
+                    x2 = max(x2, p[j])
+                    y2 = max(y2, p[j+1])
+            d = self._dot
+            for i in glyph[1]:
+                line = self._geo[i]
+                x1 = min(x1, line[0] - d)
+                y1 = min(y1, line[1] - d)
+                x2 = max(x2, line[0] + d)
+                y2 = max(y2, line[1] + d)
+            box = (x1, y1, x2, y2) if x1 <= x2 else ()
+            self._gbox[idx] = box
+        return box if box else None
+
+    def measureText32(self, txt):
+        '''
+        Size of text for current setText32 parameters without drawing.
+        Returns (x, y, w, h, ex, ey) - bounding box relative to the start
+        point (centre of the first character) and the end point, where
+        the next text would continue.
+        '''
+        self._check32()
+        ax, ay = self._adv
+        x1 = y1 = 0x7FFF
+        x2 = y2 = -0x7FFF
+        x = y = 0
+        for ch in txt:
+            b = self._glyph_box(_index32(ch))
+            if b is not None:
+                x1 = min(x1, x + b[0])
+                y1 = min(y1, y + b[1])
+                x2 = max(x2, x + b[2])
+                y2 = max(y2, y + b[3])
+            x += ax
+            y += ay
+        if x1 > x2:
+            return (0, 0, 0, 0, x, y)
+        return (x1, y1, x2 - x1 + 1, y2 - y1 + 1, x, y)
+
+    def layoutText32(self, txt, width=None, align=ALIGN_LEFT, spacing=None):
+        '''
+        Split text into lines (by '\\n' and word wrapping to width in pixels)
+        and align them. Lines are laid out in the direction of text and
+        rotated by its angle. The box starts at the left edge of the first
+        character. Returns list of (line, dx, dy), start points of lines
+        relative to the start point of the first line of the box.
+        spacing - distance of lines, default is the height of character + gap
+        '''
+        # pixels of character are within +-(width + bold//2) around its
+        # centre, a line of n characters has cell + (n-1)*shift pixels
+        cell = 2*(self.width + self.bold//2) + 1
+        if spacing is None:
+            spacing = 2*self.height + self.shift - 2*self.width
+        lines = []
+        for par in txt.split('\n'):
+            if width is None:
+                lines.append(par)
+                continue
+            # characters per line
+            n = max((width - cell)//self.shift + 1, 1)
+            line = None
+            for word in par.split(' '):
+                if line is not None and len(line) + 1 + len(word) <= n:
+                    line += ' ' + word
+                    continue
+                if line is not None:
+                    lines.append(line)
+                while len(word) > n:
+                    lines.append(word[:n])
+                    word = word[n:]
+                line = word
+            lines.append(line)
+        if width is None:
+            width = cell + (max([len(l) for l in lines]) - 1)*self.shift
+        out = []
+        for i in range(len(lines)):
+            u = 0
+            if align != ALIGN_LEFT:
+                # free pixels of the box right of the line
+                u = width - cell - (len(lines[i]) - 1)*self.shift
+                if align == ALIGN_CENTER:
+                    u //= 2
+            d = rotation([u, i*spacing], self.angle)
+            out.append((lines[i], d[0], d[1]))
+        return out
+
+    def drawText32(self, txt, x, y, c, width=None, align=ALIGN_LEFT, spacing=None):
+        '''
+        Draw multi-line text by layoutText32 at start point x, y.
+        Returns area of drawn text (x, y, w, h).
+        '''
+        x1 = y1 = 0x7FFF
+        x2 = y2 = -0x7FFF
+        for line, dx, dy in self.layoutText32(txt, width, align, spacing):
+            self.putText32(line, x + dx, y + dy, c)
+            m = self.measureText32(line)
+            if m[2]:
+                x1 = min(x1, x + dx + m[0])
+                y1 = min(y1, y + dy + m[1])
+                x2 = max(x2, x + dx + m[0] + m[2])
+                y2 = max(y2, y + dy + m[1] + m[3])
+        if x1 > x2:
+            return (x, y, 0, 0)
+        return (x1, y1, x2 - x1, y2 - y1)
+
+    def _extent32(self, txt, x, y):
+        # area of text (x, y, w, h) for dirty tracking
+        m = self.measureText32(txt)
+        if m[2] == 0:
+            return None
+        return (x + m[0], y + m[1], m[2], m[3])
+
+    def setGlyphCache(self, budget=2048):
+        '''
+        Enable cache of rendered characters for putText32.
+        Each character is rendered once into a small MONO_HLSB FrameBuffer
+        and then only blitted. Budget is the limit of bitmap bytes,
+        budget=0 disables the cache.
+        '''
+        if budget:
+            self.glyph_cache = LRUCache(budget)
+        else:
+            self.glyph_cache = None
+        return self.glyph_cache
+
+    def _char32(self, idx, x, y, c):
+        geo = self._geo
+        glyph = _glyph32(idx)
+        for i in glyph[0]:
+            line = geo[i]
+            self.hexagonI4(x+line[0],y+line[1],x+line[2],y+line[3],self.bold,c)
+        for i in glyph[1]:
+            line = geo[i]
+            self.circle(x+line[0],y+line[1],self._dot,c,True)
+
+    def _render32(self, idx, c):
+        '''
+        Render one character into a new FrameBuffer for glyph cache.
+        Segments compiled by setText32 are drawn right into the scratch
+        FrameBuffer, its box is the exact area of the character with 1 px
+        margin, so the pixels are the same as from direct drawing.
+        Returns (fbuf, x offset, y offset, palette, key) and size in bytes
+        '''
+        box = self._glyph_box(idx)
+        x1 = box[0] - 1
+        y1 = box[1] - 1
+        w = box[2] - x1 + 2
+        h = box[3] - y1 + 2
+        size = ((w+7)//8)*h
+        fb = FrameBuffer(bytearray(size), w, h, MONO_HLSB)
+        saved = (self.fb, self._clip)
+        self.fb = fb
+        self._clip = None
+        try:
+            # methods of the class, hook layers of the instance are not involved
+            geo = self._geo
+            glyph = _glyph32(idx)
+            for i in glyph[0]:
+                line = geo[i]
+                FrBuffExpansion.hexagonI4(self, line[0]-x1, line[1]-y1, line[2]-x1, line[3]-y1, self.bold, 1)
+            for i in glyph[1]:
+                line = geo[i]
+                FrBuffExpansion.fill_circle(self, line[0]-x1, line[1]-y1, self._dot, 1)
+        finally:
+            self.fb, self._clip = saved
+        pal, key = _mono_palette(c)
+        return (fb, x1, y1, pal, key), size
+
     def putText32(self, txt: str, x: int, y: int, c):
-        line=[0,0,0,0]
-        dot = 2*self.bold//3
-        if dot == 0:
-            dot = 1
+        self._check32()
+        cache = self.glyph_cache
+        ax, ay = self._adv
+        clip = self._clip
         for ch in txt:
-            if ((ord(ch)-32) >= len(_CH32SET)) or (ord(ch) < 32):
-                # print(ord(ch))
-                code = _CH32SET[95] # (127 - 32)
-            else:
-                code = _CH32SET[ord(ch)-32]
-            for i in range(32):
-                if (code & 0x0001) == 0x0001:
-                    if (_PAIRS[i]!=0) and ((code & (1<<_PAIRS[i])) == (1<<_PAIRS[i])) :
-                        code ^= 1<<_PAIRS[i]
-                        line[0]=_SEGM[i][0]
-                        line[1]=_SEGM[i][1]
-                        line[2]=_SEGM[i+_PAIRS[i]][2]
-                        line[3]=_SEGM[i+_PAIRS[i]][3]
-                    else:
-                        line = _SEGM[i]
-                    line = adjust(line, self.height, self.width)
-                    line = rotation(line, self.angle)
-                    if (i >= 29):
-                        self.circle(x+line[0],y+line[1],dot,c,True)
-                    else:
-                        self.hexagonI4(x+line[0],y+line[1],x+line[2],y+line[3],self.bold,c)
-                code //= 2
-            line=[self.shift, 0, 0, 0]
-            line = rotation(line, self.angle)
-            x += line[0]
-            y += line[1]
-
-    def img(self, x0, y0, pixels: list, rotation=0):
-        '''
-        Covert 2D array of pixels[y][x] to FrameBuffer at position (x0,y0)
-        '''
-        if isinstance(pixels[0][0],int):
-            if rotation == ROT_0_DEG:
-                # direct print
-                for y in range(len(pixels)):
-                    for x in range(len(pixels[0])):
-                            self.fb.pixel(x0+x, y0+y, pixels[y][x])
-            elif rotation == ROT_90_DEG:
-                # +90 degree rotation
-                x0 += len(pixels)
-                for y in range(len(pixels)):
-                    for x in range(len(pixels[0])):
-                            self.fb.pixel(x0-y, y0+x, pixels[y][x])
-            elif rotation == ROT_180_DEG:
-                # +180 degree rotation
-                x0 += len(pixels[0])
-                y0 += len(pixels)
-                for y in range(len(pixels)):
-                    for x in range(len(pixels[0])):
-                            self.fb.pixel(x0-x, y0-y, pixels[y][x])
-            elif rotation == ROT_270_DEG:
-                # -90 degree rotation
-                y0 += len(pixels[0])
-                for y in range(len(pixels)):
-                    for x in range(len(pixels[0])):
-                            self.fb.pixel(x0+y, y0-x, pixels[y][x])
+            idx = _index32(ch)
+            k = _INSIDE
+            if clip is not None:
+                b = self._glyph_box(idx)
+                k = _OUTSIDE if b is None else self._clipped(x+b[0], y+b[1], x+b[2], y+b[3])
+                if k == _OUTSIDE:
+                    x += ax
+                    y += ay
+                    continue
+            b = None if cache is None or k == _PARTLY else self._glyph_box(idx)
+            if b is None or x + b[0] < 0:
+                # nodes of poly left of the screen are rounded towards zero by
+                # FrameBuffer, cached glyph would differ there
+                self._char32(idx, x, y, c)
             else:
-                print("Error: Unknown rotation")
-        else:
-            print("Error: Unsupported format of pixels")
+                key = (idx, self.height, self.width, self.bold, self.angle, c)
+                g = cache.get(key)
+                if g is None:
+                    g, size = self._render32(idx, c)
+                    cache.put(key, g, size)
+                self.fb.blit(g[0], x+g[1], y+g[2], g[4], g[3])
+            x += ax
+            y += ay
+
+    def putTextAtlas(self, font, txt: str, x: int, y: int, c):
+        '''
+        Draw text from precompiled font atlas (see host/mkatlas.py) only by
+        blits of stored bitmaps. Characters not in the atlas are skipped.
+        x,y - position of the centre point of the first character
+        '''
+        chars, ax, ay, index, bitmaps = font
+        pal, key = _mono_palette(c)
+        mv = memoryview(bitmaps)
+        for ch in txt:
+            i = chars.find(ch)
+            if i >= 0:
+                dx, dy, w, h, ofs = struct.unpack_from(_ATLAS_INDEX, index, i*10)
+                k = self._clipped(x+dx, y+dy, x+dx+w-1, y+dy+h-1) if w else _OUTSIDE
+                if k != _OUTSIDE:
+                    bmp = mv[ofs:ofs + ((w+7)>>3)*h]
+                    try:
+                        self._blit(k, (bmp, w, h, MONO_HLSB), x+dx, y+dy, w, h, MONO_HLSB, key, pal)
+                    except:
+                        # old FrameBuffer
+                        self._blit(k, FrameBuffer(bytearray(bmp), w, h, MONO_HLSB), x+dx, y+dy, w, h, MONO_HLSB, key, pal)
+            x += ax
+            y += ay
+
+    def img(self, x0, y0, pixels, rotation=0, key=-1):
+        '''
+        Covert 2D array of pixels[y][x], PixelGrid or FBImage to FrameBuffer at position (x0,y0).
+        Pixels of color key are not drawn (transparent).
+        Rotated image is prepared in a scratch buffer and drawn by one blit.
+        '''
+        if rotation not in (ROT_0_DEG, ROT_90_DEG, ROT_180_DEG, ROT_270_DEG):
+            print("Error: Unknown rotation")
+            return
+        k = _INSIDE
+        if self._clip is not None:
+            r = _ext_img(self, x0, y0, pixels, rotation)
+            k = self._clipped(r[0], r[1], r[0] + r[2] - 1, r[1] + r[3] - 1)
+            if k == _OUTSIDE:
+                return
+        if isinstance(pixels, PixelGrid):
+            pixels = pixels.image()
+        elif not isinstance(pixels, FBImage):
+            if not isinstance(pixels[0][0],int):
+                print("Error: Unsupported format of pixels")
+                return
+            image = pixels_to_image(pixels)
+            if image is None:
+                self._img_pixels(x0, y0, pixels, rotation, key)
+                return
+            pixels = image
+        if rotation != ROT_0_DEG:
+            pixels = pixels.rotate(rotation)
+        # position of rotated images
+        if rotation != ROT_270_DEG and rotation != ROT_0_DEG:
+            x0 += 1
+        if rotation != ROT_90_DEG and rotation != ROT_0_DEG:
+            y0 += 1
+        self._blit(k, pixels.fbuf, x0, y0, pixels.width, pixels.height, pixels.format, key, pixels.palette)
+
+    def _img_pixels(self, x0, y0, pixels, rotation, key):
+        # drawing of pixels out of 16-bit range, pixel by pixel
+        for y in range(len(pixels)):
+            for x in range(len(pixels[0])):
+                c = pixels[y][x]
+                if c == key:
+                    continue
+                if rotation == ROT_0_DEG:
+                    self._point(x0+x, y0+y, c)
+                elif rotation == ROT_90_DEG:
+                    self._point(x0+len(pixels)-y, y0+x, c)
+                elif rotation == ROT_180_DEG:
+                    self._point(x0+len(pixels[0])-x, y0+len(pixels)-y, c)
+                else:
+                    self._point(x0+y, y0+len(pixels[0])-x, c)
+
+
+def _ext_line(fx, x1, y1, x2, y2, c):
+    return (min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1)
+
+def _ext_poly(fx, x, y, coords, c, f=False):
+    if len(coords) < 2:
+        return None
+    x1 = x2 = coords[0]
+    y1 = y2 = coords[1]
+    for i in range(2, len(coords) - 1, 2):
+        x1 = min(x1, coords[i])
+        x2 = max(x2, coords[i])
+        y1 = min(y1, coords[i+1])
+        y2 = max(y2, coords[i+1])
+    return (x + x1, y + y1, x2 - x1 + 1, y2 - y1 + 1)
+
+def _blit_size(fbuf):
+    # size (w, h) of blit source, None for FrameBuffer of unknown size
+    if isinstance(fbuf, (tuple, list)):
+        return (fbuf[1], fbuf[2])
+    if isinstance(fbuf, FrBuffExpansion):
+        w = fbuf.fb_width
+        h = fbuf.fb_height
+    else:
+        # replacements of FrameBuffer (host, NPFrameBuffer) have the size
+        w = getattr(fbuf, 'width', None)
+        h = getattr(fbuf, 'height', None)
+    if w is None or h is None:
+        return None
+    return (w, h)
+
+def _blit_source(fbuf):
+    # source for FrameBuffer.blit: wrapper of FrBuffExpansion and counting
+    # proxy of fb_prof (FrameBuffer in _fb) are replaced by the FrameBuffer
+    if isinstance(fbuf, FrBuffExpansion):
+        fbuf = fbuf.fb
+    return getattr(fbuf, '_fb', fbuf)
+
+def _ext_blit(fx, fbuf, x, y, key=-1, palette=None):
+    s = _blit_size(fbuf)
+    if s is None:
+        # native FrameBuffer does not tell its size
+        return fx._screen()
+    return (x, y, s[0], s[1])
+
+def _ext_hexagon(fx, x1, y1, x2, y2, b, c):
+    m = b//2 + 1
+    return (min(x1, x2) - m, min(y1, y2) - m, abs(x2 - x1) + 2*m + 1, abs(y2 - y1) + 2*m + 1)
+
+def _ext_atlas(fx, font, txt, x, y, c):
+    chars, ax, ay, index, bitmaps = font
+    x1 = y1 = 0x7FFF
+    x2 = y2 = -0x7FFF
+    for ch in txt:
+        i = chars.find(ch)
+        if i >= 0:
+            dx, dy, w, h, ofs = struct.unpack_from(_ATLAS_INDEX, index, i*10)
+            if w:
+                x1 = min(x1, x + dx)
+                y1 = min(y1, y + dy)
+                x2 = max(x2, x + dx + w)
+                y2 = max(y2, y + dy + h)
+        x += ax
+        y += ay
+    if x1 > x2:
+        return None
+    return (x1, y1, x2 - x1, y2 - y1)
+
+def _ext_img(fx, x0, y0, pixels, rotation=0, key=-1):
+    if isinstance(pixels, FBImage):
+        w = pixels.width
+        h = pixels.height
+    else:
+        w = len(pixels[0])
+        h = len(pixels)
+    if rotation == ROT_90_DEG:
+        return (x0 + 1, y0, h, w)
+    if rotation == ROT_180_DEG:
+        return (x0 + 1, y0 + 1, w, h)
+    if rotation == ROT_270_DEG:
+        return (x0, y0 + 1, h, w)
+    return (x0, y0, w, h)
+
+# area changed by drawing methods, function(FrBuffExpansion, *args) -> (x, y, w, h)
+_EXTENTS = {
+    'fill': lambda fx, c: fx._screen(),
+    'pixel': lambda fx, x, y, c=None: None if c is None else (x, y, 1, 1),
+    'hline': lambda fx, x, y, w, c: (x, y, w, 1),
+    'vline': lambda fx, x, y, h, c: (x, y, 1, h),
+    'line': _ext_line,
+    'rect': lambda fx, x, y, w, h, c, f=False: (x, y, w, h),
+    'fill_rect': lambda fx, x, y, w, h, c: (x, y, w, h),
+    'ellipse': lambda fx, x, y, xr, yr, c, f=False, m=0xF: (x - xr, y - yr, 2*xr + 1, 2*yr + 1),
+    'poly': _ext_poly,
+    'text': lambda fx, s, x, y, c=1: (x, y, 8*len(s), 8),
+    'scroll': lambda fx, xstep, ystep: fx._screen(),
+    'blit': _ext_blit,
+    'hexagonI4': _ext_hexagon,
+    'circle': lambda fx, x0, y0, r, c, f=False: (x0 - r, y0 - r, 2*r + 1, 2*r + 1),
+    'fill_circle': lambda fx, x0, y0, r, c: (x0 - r, y0 - r, 2*r + 1, 2*r + 1),
+    'putText32': lambda fx, txt, x, y, c: fx._extent32(txt, x, y),
+    'putTextAtlas': _ext_atlas,
+    'img': _ext_img,
+}
+
+
+# methods required from FrameBuffer replacements
+_FB_API = ('fill', 'pixel', 'hline', 'vline', 'line', 'rect', 'ellipse', 'poly', 'blit', 'scroll', 'text')
 
 
 class fbplus(FrBuffExpansion):
@@ -513,14 +1702,27 @@ class fbplus(FrBuffExpansion):
         '''
         super().__init__()
         self.fb = FrameBuffer(*args, **kwargs)
+        self.fb_width = args[1] if len(args) > 3 else None
+        self.fb_height = args[2] if len(args) > 3 else None
+        self.fb_format = args[3] if len(args) > 3 else None
 
 
 class fbadd(FrBuffExpansion):
-    def __init__(self, framebuf):
+    def __init__(self, framebuf, width=None, height=None, format=None):
         '''
-        Using FrBuffExpansion with already defined FrameBuffer
+        Using FrBuffExpansion with already defined FrameBuffer.
+        Optional size of FrameBuffer limits the areas of dirty_rects(),
+        size and format are needed for clipped replay of display lists
+        (taken from attributes width, height, format if framebuf has them).
+        framebuf can be also an object with the methods of FrameBuffer.
         '''
         super().__init__()
         if not isinstance(framebuf, FrameBuffer):
-            raise TypeError("framebuf is not FrameBuffer instance")
+            # other backend with FrameBuffer methods (e.g. host/npframebuf.py)
+            for name in _FB_API:
+                if not hasattr(framebuf, name):
+                    raise TypeError("framebuf is not FrameBuffer instance")
         self.fb = framebuf
+        self.fb_width = getattr(framebuf, 'width', None) if width is None else width
+        self.fb_height = getattr(framebuf, 'height', None) if height is None else height
+        self.fb_format = getattr(framebuf, 'format', None) if format is None else format
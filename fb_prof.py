@@ -0,0 +1,221 @@
+"""
+Profiler of FrBuffExpansion and EPD drivers
+
+Drawing methods of FrBuffExpansion are wrapped by a hook layer, FrameBuffer
+primitives by a counting proxy over fx.fb and methods of the EPD (SPI
+transfer and waiting for the busy pin) by instance attributes. Nothing is
+installed without attach(), so the methods pay nothing when not profiled.
+"""
+
+from time import ticks_us, ticks_diff
+import gc
+import fb_plus
+
+try:
+    _mem = gc.mem_alloc
+except AttributeError:
+    # no heap statistics (CPython)
+    def _mem():
+        return 0
+
+# wrapped methods of FrBuffExpansion (besides the drawing methods of _EXTENTS)
+_METHODS = ('setText32', 'measureText32', 'layoutText32', 'drawText32')
+
+# counted primitives of FrameBuffer and pixels touched by them (areas for blit, poly, ellipse)
+_PRIMS = {
+    'fill': lambda fb, c: 0,
+    'pixel': lambda fb, x, y, c=None: 1,
+    'hline': lambda fb, x, y, w, c: max(w, 0),
+    'vline': lambda fb, x, y, h, c: max(h, 0),
+    'line': lambda fb, x1, y1, x2, y2, c: max(abs(x2 - x1), abs(y2 - y1)) + 1,
+    'rect': lambda fb, x, y, w, h, c, f=False: max(w, 0) * max(h, 0) if f else 2 * max(w + h, 0),
+    'fill_rect': lambda fb, x, y, w, h, c: max(w, 0) * max(h, 0),
+    'ellipse': lambda fb, x, y, xr, yr, c, f=False, m=0xF: (2*xr + 1) * (2*yr + 1) if f else 4 * (xr + yr),
+    'poly': lambda fb, x, y, coords, c, f=False: _poly_px(coords, f),
+    'text': lambda fb, s, x, y, c=1: 64 * len(s),
+    'scroll': lambda fb, xstep, ystep: 0,
+    'blit': lambda fb, fbuf, x, y, key=-1, palette=None: _blit_px(fbuf),
+}
+
+# methods of EPD, bytes are counted for the SPI ones
+_EPD_SPI = ('_command', '_data', '_fill_data', '_write_window')
+_EPD_METHODS = _EPD_SPI + ('wait_until_idle', 'set_frame_memory', 'display_frame', 'display_partial')
+
+
+def _blit_px(fbuf):
+    # area of source, 0 for FrameBuffer of unknown size
+    s = fb_plus._blit_size(fbuf)
+    return s[0] * s[1] if s else 0
+
+
+def _poly_px(coords, f):
+    if len(coords) == 0:
+        return 0
+    xs = coords[0::2]
+    ys = coords[1::2]
+    w = max(xs) - min(xs) + 1
+    h = max(ys) - min(ys) + 1
+    return w * h if f else 2 * (w + h)
+
+
+class _FBCounter():
+    # proxy of FrameBuffer counting calls and pixels of primitives, FrameBuffer
+    # is in _fb for blits from it (see fb_plus._blit_source)
+    def __init__(self, fb, prof, width=None, height=None):
+        self._fb = fb
+        if width is not None and height is not None:
+            # size for blits from the proxy
+            self.width = width
+            self.height = height
+        for name in _PRIMS:
+            try:
+                method = getattr(fb, name)
+            except AttributeError:
+                # old FrameBuffer, fb_plus uses its fallback
+                continue
+            setattr(self, name, self._count(name, method, prof))
+
+    def _count(self, name, method, prof):
+        px = _PRIMS[name]
+        stat = prof.prims.setdefault(name, [0, 0])
+        blit = name == 'blit'
+
+        def wrapper(*args, **kwargs):
+            n = px(self, *args, **kwargs)
+            stat[0] += 1
+            stat[1] += n
+            prof.pixels += n
+            if blit:
+                # FrameBuffer.blit takes no proxy (or wrapper) as source
+                args = (fb_plus._blit_source(args[0]),) + args[1:]
+            return method(*args, **kwargs)
+        return wrapper
+
+    def __getattr__(self, name):
+        return getattr(self._fb, name)
+
+
+class Profiler():
+    def __init__(self):
+        self._fx = None
+        self._epd = None
+        # name: [calls, us, heap bytes, pixels]
+        self.methods = {}
+        # name: [calls, pixels]
+        self.prims = {}
+        # name: [calls, us, SPI bytes]
+        self.epd = {}
+        self.pixels = 0
+
+    def reset(self):
+        '''
+        Clear the statistics
+        '''
+        # in place, the lists are shared with installed wrappers
+        for stats in (self.methods, self.prims, self.epd):
+            for v in stats.values():
+                for i in range(len(v)):
+                    v[i] = 0
+        self.pixels = 0
+
+    def attach(self, fx):
+        '''
+        Profile drawing methods of FrBuffExpansion fx and primitives of its
+        FrameBuffer until detach(). Times include nested calls (e.g.
+        hexagonI4 of putText32).
+        '''
+        self.detach_fx()
+        self._fx = fx
+        hooks = {}
+        for name in tuple(fb_plus._EXTENTS) + _METHODS:
+            hooks[name] = self._hook(name)
+        fx._set_hooks('prof', hooks)
+        fx.fb = _FBCounter(fx.fb, self, fx.fb_width, fx.fb_height)
+
+    def detach_fx(self):
+        if self._fx is not None:
+            self._fx._set_hooks('prof', None)
+            self._fx.fb = self._fx.fb._fb
+            self._fx = None
+
+    def _hook(self, name):
+        def hook(method):
+            stat = self.methods.setdefault(name, [0, 0, 0, 0])
+
+            def wrapper(*args, **kwargs):
+                px = self.pixels
+                m = _mem()
+                t = ticks_us()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    stat[1] += ticks_diff(ticks_us(), t)
+                    stat[0] += 1
+                    # gc during the call makes the difference negative
+                    stat[2] += max(_mem() - m, 0)
+                    stat[3] += self.pixels - px
+            return wrapper
+        return hook
+
+    def attach_epd(self, epd):
+        '''
+        Profile SPI transfer and waiting of EPD driver (epaper2in9.EPD or
+        epaper2in9_async.EPDAsync) until detach().
+        '''
+        self.detach_epd()
+        self._epd = epd
+        for name in _EPD_METHODS:
+            setattr(epd, name, self._epd_wrapper(name, getattr(epd, name)))
+
+    def detach_epd(self):
+        if self._epd is not None:
+            for name in _EPD_METHODS:
+                delattr(self._epd, name)
+            self._epd = None
+
+    def detach(self):
+        self.detach_fx()
+        self.detach_epd()
+
+    def _epd_wrapper(self, name, method):
+        stat = self.epd.setdefault(name, [0, 0, 0])
+        epd = self._epd
+        spi = name in _EPD_SPI
+
+        def done(t, b):
+            stat[0] += 1
+            stat[1] += ticks_diff(ticks_us(), t)
+            # byte counters of EPD are reset only at the end of a frame
+            if spi:
+                stat[2] += max(epd.bytes - b, 0)
+
+        async def awaited(coro, t, b):
+            try:
+                return await coro
+            finally:
+                done(t, b)
+
+        def wrapper(*args, **kwargs):
+            t = ticks_us()
+            b = epd.bytes
+            r = method(*args, **kwargs)
+            if hasattr(r, 'send'):
+                # coroutine of EPDAsync, measured until it ends
+                return awaited(r, t, b)
+            done(t, b)
+            return r
+        return wrapper
+
+    def report(self):
+        '''
+        Statistics as one compact line (for logging over UART or MQTT):
+        fx name:calls:us:heap:pixels ... fb name:calls:pixels ... epd name:calls:us:bytes ...
+        Only called methods are included.
+        '''
+        out = []
+        for title, stats in (('fx', self.methods), ('fb', self.prims), ('epd', self.epd)):
+            items = [name + ':' + ':'.join([str(v) for v in stats[name]])
+                     for name in sorted(stats) if stats[name][0]]
+            if items:
+                out.append(title + ' ' + ' '.join(items))
+        return ' | '.join(out)
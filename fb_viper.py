@@ -0,0 +1,179 @@
+"""
+Viper variants of the hot pixel loops of fb_plus and bmp_rd
+
+The functions work on ptr8/ptr16 views of the buffers and give the same
+results as the pure-Python code they replace. fb_plus and bmp_rd import
+them when the native code emitter is available (importing this module
+fails elsewhere, e.g. on CPython or ports without viper) and keep their
+own loops otherwise.
+"""
+
+import micropython
+
+
+@micropython.viper
+def rotate_mono(src, ss: int, w: int, h: int, dst, ds: int, rotation: int):
+    # rotation of MONO_HLSB buffer by 8x8 bit tiles, all bytes of dst are
+    # written (see fb_plus._rotate_mono)
+    s = ptr8(src)
+    d = ptr8(dst)
+    n = (w + 7) >> 3
+    if rotation == 2:
+        # bytes of row in reverse order with reversed bits, shifted by the padding
+        shift = 8 * n - w
+        y = 0
+        while y < h:
+            so = y * ss + n - 1
+            do = (h - 1 - y) * ds
+            a = 0
+            j = 0
+            while j <= ds:
+                b = 0
+                if j < n:
+                    b = s[so - j]
+                    b = ((b & 0xF0) >> 4) | ((b & 0x0F) << 4)
+                    b = ((b & 0xCC) >> 2) | ((b & 0x33) << 2)
+                    b = ((b & 0xAA) >> 1) | ((b & 0x55) << 1)
+                if j > 0:
+                    d[do + j - 1] = ((a << shift) | (b >> (8 - shift))) & 0xFF
+                a = b
+                j += 1
+            y += 1
+        return
+    tile = bytearray(8)
+    r = ptr8(tile)
+    k = 0
+    while k < ds:
+        bx = 0
+        while bx < n:
+            # 8 source rows of tile
+            j = 0
+            while j < 8:
+                if rotation == 1:
+                    y = h - 1 - 8 * k - j
+                else:
+                    y = 8 * k + j
+                if 0 <= y and y < h:
+                    r[j] = s[y * ss + bx]
+                else:
+                    r[j] = 0
+                j += 1
+            # transpose like fb_plus._transpose8: pairs (i, i+4), (i, i+2), (i, i+1)
+            i = 0
+            while i < 4:
+                a = r[i]
+                b = r[i + 4]
+                r[i] = (a & 0xF0) | (b >> 4)
+                r[i + 4] = ((a << 4) & 0xF0) | (b & 0x0F)
+                i += 1
+            i = 0
+            while i < 4:
+                j = i + (i & 2)
+                a = r[j]
+                b = r[j + 2]
+                r[j] = (a & 0xCC) | ((b >> 2) & 0x33)
+                r[j + 2] = ((a << 2) & 0xCC) | (b & 0x33)
+                i += 1
+            i = 0
+            while i < 8:
+                a = r[i]
+                b = r[i + 1]
+                r[i] = (a & 0xAA) | ((b >> 1) & 0x55)
+                r[i + 1] = ((a << 1) & 0xAA) | (b & 0x55)
+                i += 2
+            x = 8 * bx
+            i = 0
+            while i < 8 and i < w - x:
+                if rotation == 1:
+                    d[(x + i) * ds + k] = r[i]
+                else:
+                    d[(w - 1 - x - i) * ds + k] = r[i]
+                i += 1
+            bx += 1
+        k += 1
+
+
+@micropython.viper
+def rotate_bytes(src, ss: int, w: int, h: int, dst, ds: int, e: int, rotation: int):
+    # rotation of buffer with e (1, 2) bytes per pixel (see fb_plus._rotate_bytes)
+    s = ptr8(src)
+    d = ptr8(dst)
+    y = 0
+    while y < h:
+        so = y * ss
+        if rotation == 2:
+            do = (h - 1 - y) * ds + (w - 1) * e
+            step = 0 - e
+        elif rotation == 1:
+            do = (h - 1 - y) * e
+            step = ds
+        else:
+            do = (w - 1) * ds + y * e
+            step = 0 - ds
+        x = 0
+        while x < w:
+            d[do] = s[so]
+            if e == 2:
+                d[do + 1] = s[so + 1]
+            so += e
+            do += step
+            x += 1
+        y += 1
+
+
+@micropython.viper
+def circle_octant(r: int, out) -> int:
+    # points (x, y) of one octant of circle into array('h'), returns number of values
+    p = ptr16(out)
+    f = 1 - r
+    ddF_x = 1
+    ddF_y = 0 - 2 * r
+    x = 0
+    y = r
+    n = 0
+    while x < y:
+        if f >= 0:
+            y -= 1
+            ddF_y += 2
+            f += ddF_y
+        x += 1
+        ddF_x += 2
+        f += ddF_x
+        p[n] = x
+        p[n + 1] = y
+        n += 2
+    return n
+
+
+@micropython.viper
+def index_8bpp(raw, row, ct, x: int, w: int):
+    # colors of 8bpp pixels by color table (see bmp_rd._index_8bpp)
+    p = ptr8(raw)
+    i = 0
+    while i < w:
+        row[i] = ct[p[x]]
+        x += 1
+        i += 1
+
+
+@micropython.viper
+def index_4bpp(raw, row, ct, x: int, w: int):
+    p = ptr8(raw)
+    i = 0
+    while i < w:
+        if x & 1:
+            row[i] = ct[p[x >> 1] & 0x0F]
+        else:
+            row[i] = ct[p[x >> 1] >> 4]
+        x += 1
+        i += 1
+
+
+@micropython.viper
+def index_1bpp(raw, row, ct, x: int, w: int):
+    p = ptr8(raw)
+    i = 0
+    while i < w:
+        row[i] = ct[(p[x >> 3] >> (7 - (x & 7))) & 1]
+        x += 1
+        i += 1
@@ -0,0 +1,348 @@
+'''
+Pure-Python stand-in of the MicroPython "framebuf" module
+
+Used to run fb_plus on the host (CPython or MicroPython Unix port without
+framebuf). Drawing algorithms follow extmod/modframebuf.c so that rendered
+buffers are byte-identical with the firmware. text() uses no font and only
+marks the 8x8 character cells.
+'''
+
+MONO_VLSB = 0
+MVLSB = MONO_VLSB
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+
+def _cdiv(a, b):
+    # C integer division (truncation towards zero)
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+class FrameBuffer(object):
+    def __init__(self, buffer, width, height, format, stride=None):
+        if stride is None:
+            stride = width
+        if format in (MONO_HLSB, MONO_HMSB):
+            stride = (stride + 7) & ~7
+        elif format == GS2_HMSB:
+            stride = (stride + 3) & ~3
+        elif format == GS4_HMSB:
+            stride = (stride + 1) & ~1
+        elif format not in (MONO_VLSB, RGB565, GS8):
+            raise ValueError('invalid format')
+        self.buf = buffer
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = stride
+
+    # pixel access
+    def _set(self, x, y, c):
+        buf = self.buf
+        fmt = self.format
+        if fmt == MONO_HLSB:
+            i = (x + y * self.stride) >> 3
+            o = 7 - (x & 7)
+            buf[i] = (buf[i] & ~(1 << o)) | ((c != 0) << o)
+        elif fmt == MONO_VLSB:
+            i = (y >> 3) * self.stride + x
+            o = y & 7
+            buf[i] = (buf[i] & ~(1 << o)) | ((c != 0) << o)
+        elif fmt == MONO_HMSB:
+            i = (x + y * self.stride) >> 3
+            o = x & 7
+            buf[i] = (buf[i] & ~(1 << o)) | ((c != 0) << o)
+        elif fmt == GS8:
+            buf[x + y * self.stride] = c & 0xFF
+        elif fmt == RGB565:
+            i = (x + y * self.stride) << 1
+            buf[i] = c & 0xFF
+            buf[i + 1] = (c >> 8) & 0xFF
+        elif fmt == GS4_HMSB:
+            i = (x + y * self.stride) >> 1
+            if x & 1:
+                buf[i] = (c & 0x0F) | (buf[i] & 0xF0)
+            else:
+                buf[i] = ((c << 4) & 0xF0) | (buf[i] & 0x0F)
+        else:
+            i = (x + y * self.stride) >> 2
+            o = (x & 3) << 1
+            buf[i] = (buf[i] & ~(3 << o)) | ((c & 3) << o)
+
+    def _get(self, x, y):
+        buf = self.buf
+        fmt = self.format
+        if fmt == MONO_HLSB:
+            return (buf[(x + y * self.stride) >> 3] >> (7 - (x & 7))) & 1
+        if fmt == MONO_VLSB:
+            return (buf[(y >> 3) * self.stride + x] >> (y & 7)) & 1
+        if fmt == MONO_HMSB:
+            return (buf[(x + y * self.stride) >> 3] >> (x & 7)) & 1
+        if fmt == GS8:
+            return buf[x + y * self.stride]
+        if fmt == RGB565:
+            i = (x + y * self.stride) << 1
+            return buf[i] | (buf[i + 1] << 8)
+        if fmt == GS4_HMSB:
+            b = buf[(x + y * self.stride) >> 1]
+            return b & 0x0F if x & 1 else b >> 4
+        return (buf[(x + y * self.stride) >> 2] >> ((x & 3) << 1)) & 3
+
+    def _fill_rect(self, x, y, w, h, c):
+        if h < 1 or w < 1 or x + w <= 0 or y + h <= 0 or y >= self.height or x >= self.width:
+            return
+        xend = min(self.width, x + w)
+        yend = min(self.height, y + h)
+        x = max(x, 0)
+        y = max(y, 0)
+        for yy in range(y, yend):
+            for xx in range(x, xend):
+                self._set(xx, yy, c)
+
+    def _set_checked(self, x, y, c, mask=1):
+        if mask and 0 <= x < self.width and 0 <= y < self.height:
+            self._set(x, y, c)
+
+    # public API
+    def fill(self, c):
+        self._fill_rect(0, 0, self.width, self.height, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        self._fill_rect(x, y, w, h, c)
+
+    def pixel(self, x, y, c=None):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            if c is None:
+                return self._get(x, y)
+            self._set(x, y, c)
+        return None
+
+    def hline(self, x, y, w, c):
+        self._fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self._fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self._fill_rect(x, y, w, h, c)
+        else:
+            self._fill_rect(x, y, w, 1, c)
+            self._fill_rect(x, y + h - 1, w, 1, c)
+            self._fill_rect(x, y, 1, h, c)
+            self._fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx = x2 - x1
+        if dx > 0:
+            sx = 1
+        else:
+            dx = -dx
+            sx = -1
+        dy = y2 - y1
+        if dy > 0:
+            sy = 1
+        else:
+            dy = -dy
+            sy = -1
+        steep = dy > dx
+        if steep:
+            x1, y1 = y1, x1
+            dx, dy = dy, dx
+            sx, sy = sy, sx
+        e = 2 * dy - dx
+        for _ in range(dx):
+            if steep:
+                self._set_checked(y1, x1, c)
+            else:
+                self._set_checked(x1, y1, c)
+            while e >= 0:
+                y1 += sy
+                e -= 2 * dx
+            x1 += sx
+            e += 2 * dy
+        self._set_checked(x2, y2, c)
+
+    def _ellipse_points(self, cx, cy, x, y, c, mask):
+        if mask & 0x10:
+            if mask & 1:
+                self._fill_rect(cx, cy - y, x + 1, 1, c)
+            if mask & 2:
+                self._fill_rect(cx - x, cy - y, x + 1, 1, c)
+            if mask & 4:
+                self._fill_rect(cx - x, cy + y, x + 1, 1, c)
+            if mask & 8:
+                self._fill_rect(cx, cy + y, x + 1, 1, c)
+        else:
+            self._set_checked(cx + x, cy - y, c, mask & 1)
+            self._set_checked(cx - x, cy - y, c, mask & 2)
+            self._set_checked(cx - x, cy + y, c, mask & 4)
+            self._set_checked(cx + x, cy + y, c, mask & 8)
+
+    def ellipse(self, cx, cy, xr, yr, c, f=False, m=0xF):
+        mask = (0x10 if f else 0) | (m & 0xF)
+        if xr == 0 and yr == 0:
+            # the loops below would not end, single pixel like modframebuf.c
+            if mask & 0xF:
+                self._set_checked(cx, cy, c)
+            return
+        two_asquare = 2 * xr * xr
+        two_bsquare = 2 * yr * yr
+        x = xr
+        y = 0
+        xchange = yr * yr * (1 - 2 * xr)
+        ychange = xr * xr
+        err = 0
+        stoppingx = two_bsquare * xr
+        stoppingy = 0
+        while stoppingx >= stoppingy:
+            self._ellipse_points(cx, cy, x, y, c, mask)
+            y += 1
+            stoppingy += two_asquare
+            err += ychange
+            ychange += two_asquare
+            if (2 * err + xchange) > 0:
+                x -= 1
+                stoppingx -= two_bsquare
+                err += xchange
+                xchange += two_bsquare
+        x = 0
+        y = yr
+        xchange = yr * yr
+        ychange = xr * xr * (1 - 2 * yr)
+        err = 0
+        stoppingx = 0
+        stoppingy = two_asquare * yr
+        while stoppingx <= stoppingy:
+            self._ellipse_points(cx, cy, x, y, c, mask)
+            x += 1
+            stoppingx += two_bsquare
+            err += xchange
+            xchange += two_bsquare
+            if (2 * err + ychange) > 0:
+                y -= 1
+                stoppingy -= two_asquare
+                err += ychange
+                ychange += two_asquare
+
+    def poly(self, x, y, coords, c, f=False):
+        n = len(coords) // 2
+        if n == 0:
+            return
+        if f:
+            y_min = min(coords[1:2 * n:2])
+            y_max = max(coords[1:2 * n:2])
+            for row in range(y_min, y_max + 1):
+                nodes = []
+                px1 = coords[0]
+                py1 = coords[1]
+                i = 2 * n - 1
+                while i >= 0:
+                    py2 = coords[i]
+                    px2 = coords[i - 1]
+                    i -= 2
+                    if py1 != py2 and ((py1 > row >= py2) or (py1 <= row < py2)):
+                        nodes.append(_cdiv(32 * px1 + _cdiv(32 * (px2 - px1) * (row - py1), py2 - py1) + 16, 32))
+                    elif row == max(py1, py2):
+                        if py1 < py2:
+                            self._set_checked(x + px2, y + py2, c)
+                        elif py2 < py1:
+                            self._set_checked(x + px1, y + py1, c)
+                        else:
+                            self.line(x + px1, y + py1, x + px2, y + py2, c)
+                    px1 = px2
+                    py1 = py2
+                nodes.sort()
+                for j in range(0, len(nodes) - 1, 2):
+                    self._fill_rect(x + nodes[j], y + row, nodes[j + 1] - nodes[j] + 1, 1, c)
+        else:
+            px1 = coords[0]
+            py1 = coords[1]
+            i = 2 * n - 1
+            while i >= 0:
+                py2 = coords[i]
+                px2 = coords[i - 1]
+                i -= 2
+                self.line(x + px1, y + py1, x + px2, y + py2, c)
+                px1 = px2
+                py1 = py2
+
+    def scroll(self, xstep, ystep):
+        if xstep < 0:
+            sx, xend, dx = 0, self.width + xstep, 1
+            if xend <= 0:
+                return
+        else:
+            sx, xend, dx = self.width - 1, xstep - 1, -1
+            if xend >= sx:
+                return
+        if ystep < 0:
+            y, yend, dy = 0, self.height + ystep, 1
+            if yend <= 0:
+                return
+        else:
+            y, yend, dy = self.height - 1, ystep - 1, -1
+            if yend >= y:
+                return
+        while y != yend:
+            x = sx
+            while x != xend:
+                self._set(x, y, self._get(x - xstep, y - ystep))
+                x += dx
+            y += dy
+
+    def text(self, s, x, y, c=1):
+        for ch in s:
+            self.rect(x + 1, y + 1, 6, 6, c)
+            x += 8
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        if not isinstance(fbuf, FrameBuffer):
+            fbuf = FrameBuffer(*fbuf)
+        if palette is not None and not isinstance(palette, FrameBuffer):
+            palette = FrameBuffer(*palette)
+        if x >= self.width or y >= self.height or -x >= fbuf.width or -y >= fbuf.height:
+            return
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = max(0, -x)
+        y1 = max(0, -y)
+        x0end = min(self.width, x + fbuf.width)
+        y0end = min(self.height, y + fbuf.height)
+        # colors of palette looked up once
+        pal = None
+        if palette is not None:
+            pal = [palette._get(i, 0) for i in range(palette.width)]
+            n = len(pal)
+        # bytes of MONO_HLSB source with all 8 pixels of key color are skipped
+        skip = None
+        if fbuf.format == MONO_HLSB:
+            if (0 if pal is None else pal[0]) == key:
+                skip = 0
+            elif (1 if pal is None else pal[1 % n]) == key:
+                skip = 0xFF
+        sbuf = fbuf.buf
+        get = fbuf._get
+        put = self._set
+        while y0 < y0end:
+            cx0 = x0
+            cx1 = x1
+            while cx0 < x0end:
+                if skip is not None and not cx1 & 7 and sbuf[(cx1 + y1 * fbuf.stride) >> 3] == skip:
+                    cx0 += 8
+                    cx1 += 8
+                    continue
+                col = get(cx1, y1)
+                if pal is not None:
+                    col = pal[col] if col < n else palette._get(col, 0)
+                if col != key:
+                    put(cx0, y0, col)
+                cx0 += 1
+                cx1 += 1
+            y0 += 1
+            y1 += 1
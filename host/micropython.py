@@ -0,0 +1,7 @@
+'''
+Pure-Python stand-in of the MicroPython "micropython" module
+'''
+
+
+def const(expr):
+    return expr
@@ -0,0 +1,104 @@
+'''
+Font atlas compiler for putTextAtlas (runs on the host with CPython)
+
+Characters of the 32-segment font are rendered by FrBuffExpansion against
+the pure-Python framebuf stand-in and written as a Python module with bytes
+only. Frozen into the firmware, the atlas stays in flash.
+
+    python host/mkatlas.py -o font_atlas.py -c "0123456789:.-C" 20,12,2,0 30,16,3,90
+
+Each font argument is height,width,bold,angle[,gap] and gives one constant
+FONT_<height>_<width>_<bold>_<angle>[_g<gap>] in the module (negative angle
+as m<angle>, gap other than 1 as suffix, e.g. FONT_16_10_2_m90 for
+16,10,2,-90 and FONT_16_10_2_0_g3 for 16,10,2,0,3):
+    (chars, x advance, y advance, index, bitmaps)
+index has 10 bytes per character '<hhBBI' (x and y offset from the centre
+point, width, height, offset of the MONO_HLSB bitmap in bitmaps).
+'''
+
+import os
+import sys
+import struct
+
+HOST = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HOST))
+sys.path.insert(0, HOST)
+
+from framebuf import FrameBuffer, MONO_HLSB
+import fb_plus
+
+
+
+def compile_font(chars, height, width, bold, angle, gap=1):
+    fx = fb_plus.FrBuffExpansion()
+    fx.setText32(height, width, bold, angle, gap)
+    index = bytearray()
+    bitmaps = bytearray()
+    for ch in chars:
+        box = fx._glyph_box(fb_plus._index32(ch))
+        if box is None:
+            index += struct.pack(fb_plus._ATLAS_INDEX, 0, 0, 0, 0, len(bitmaps))
+            continue
+        w = box[2] - box[0] + 1
+        h = box[3] - box[1] + 1
+        if w > 255 or h > 255:
+            raise ValueError('character %r is larger than 255 px' % ch)
+        buf = bytearray(((w + 7) // 8) * h)
+        fx.fb = FrameBuffer(buf, w, h, MONO_HLSB)
+        fx._char32(fb_plus._index32(ch), -box[0], -box[1], 1)
+        index += struct.pack(fb_plus._ATLAS_INDEX, box[0], box[1], w, h, len(bitmaps))
+        bitmaps += buf
+    return (chars, fx._adv[0], fx._adv[1], bytes(index), bytes(bitmaps))
+
+
+def font_name(height, width, bold, angle, gap=1):
+    # identifier of the font constant, negative angle as m<angle>, gap
+    # other than 1 as suffix g<gap>
+    a = '%d' % angle if angle >= 0 else 'm%d' % -angle
+    name = 'FONT_%d_%d_%d_%s' % (height, width, bold, a)
+    if gap != 1:
+        name += '_g%d' % gap
+    return name
+
+
+def write_module(f, chars, fonts, verbose=True):
+    # verbose - print sizes of the fonts
+    f.write("# font atlas for FrBuffExpansion.putTextAtlas, generated by host/mkatlas.py\n")
+    f.write("# chars: %r\n\n" % chars)
+    total = 0
+    for p in fonts:
+        font = compile_font(chars, *p)
+        name = font_name(*p)
+        f.write('%s = (%r, %d, %d,\n    %r,\n    %r)\n\n' % ((name,) + font))
+        total += len(font[3]) + len(font[4])
+        if verbose:
+            print('%s: %d bytes' % (name, len(font[3]) + len(font[4])))
+    if verbose:
+        print('total %d bytes' % total)
+
+
+def main(argv):
+    out = 'font_atlas.py'
+    chars = ''.join(chr(i) for i in range(32, 127))
+    fonts = []
+    i = 0
+    while i < len(argv):
+        if argv[i] == '-o':
+            out = argv[i + 1]
+            i += 2
+        elif argv[i] == '-c':
+            chars = argv[i + 1]
+            i += 2
+        else:
+            fonts.append([int(v) for v in argv[i].split(',')])
+            i += 1
+    if not fonts:
+        print(__doc__)
+        return 1
+    with open(out, 'w') as f:
+        write_module(f, chars, fonts)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
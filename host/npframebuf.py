@@ -0,0 +1,402 @@
+'''
+FrameBuffer with the "framebuf" API backed by a NumPy array
+
+For rendering on a server (previews of device screens). Pixels are kept
+unpacked in a 2D array (pixels[y, x]), fills, spans, polygons, blits and
+scrolls are done by array operations, lines and ellipses compute their
+points in Python and set them at once. The pixels are the same as from
+extmod/modframebuf.c (and host/framebuf.py). text() uses no font and only
+marks the 8x8 character cells like host/framebuf.py.
+
+    from npframebuf import NPFrameBuffer
+    fx = fb_plus.fbadd(NPFrameBuffer(296, 128, framebuf.MONO_HLSB))
+    fx.putText32('12:31', 10, 64, 1)
+    open('preview.png', 'wb').write(fx.fb.png())
+'''
+
+import struct
+import zlib
+import numpy as np
+
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+# bits per pixel and mask of pixel value
+_BPP = {MONO_VLSB: 1, RGB565: 16, GS4_HMSB: 4, MONO_HLSB: 1, MONO_HMSB: 1, GS2_HMSB: 2, GS8: 8}
+_MASK = {MONO_VLSB: 1, RGB565: 0xFFFF, GS4_HMSB: 0x0F, MONO_HLSB: 1, MONO_HMSB: 1, GS2_HMSB: 3, GS8: 0xFF}
+
+
+def _stride(width, format, stride=None):
+    # stride in pixels rounded like FrameBuffer
+    if stride is None:
+        stride = width
+    if format in (MONO_HLSB, MONO_HMSB):
+        stride = (stride + 7) & ~7
+    elif format == GS2_HMSB:
+        stride = (stride + 3) & ~3
+    elif format == GS4_HMSB:
+        stride = (stride + 1) & ~1
+    elif format not in _BPP:
+        raise ValueError('invalid format')
+    return stride
+
+
+def _cdiv(a, b):
+    # C integer division (truncation towards zero) of arrays
+    q = np.abs(a) // np.abs(b)
+    return np.where((a < 0) != (b < 0), -q, q)
+
+
+def unpack(buffer, width, height, format, stride=None):
+    '''
+    Pixels of FrameBuffer data as array [height, width] (uint16)
+    '''
+    stride = _stride(width, format, stride)
+    raw = np.frombuffer(bytes(buffer), dtype=np.uint8)
+    if format == RGB565:
+        a = raw[:2 * stride * height].view('<u2').reshape(height, stride)
+    elif format == GS8:
+        a = raw[:stride * height].reshape(height, stride)
+    elif format in (MONO_HLSB, MONO_HMSB):
+        rows = raw[:stride * height // 8].reshape(height, stride // 8)
+        a = np.unpackbits(rows, axis=1, bitorder='big' if format == MONO_HLSB else 'little')
+    elif format == MONO_VLSB:
+        pages = raw[:stride * ((height + 7) // 8)].reshape(-1, stride)
+        a = np.unpackbits(pages[:, np.newaxis, :], axis=1, bitorder='little').reshape(-1, stride)
+    elif format == GS4_HMSB:
+        rows = raw[:stride * height // 2].reshape(height, stride // 2)
+        a = np.stack((rows >> 4, rows & 0x0F), axis=2).reshape(height, stride)
+    else:
+        rows = raw[:stride * height // 4].reshape(height, stride // 4)
+        a = np.stack([(rows >> s) & 3 for s in (0, 2, 4, 6)], axis=2).reshape(height, stride)
+    return a[:height, :width].astype(np.uint16)
+
+
+def pack(pixels, format, stride=None):
+    '''
+    Array of pixels [height, width] as FrameBuffer data (bytearray)
+    '''
+    height, width = pixels.shape
+    stride = _stride(width, format, stride)
+    a = np.zeros((height, stride), dtype=np.uint16)
+    a[:, :width] = pixels & _MASK[format]
+    if format == RGB565:
+        return bytearray(a.astype('<u2').tobytes())
+    a = a.astype(np.uint8)
+    if format == GS8:
+        return bytearray(a.tobytes())
+    if format in (MONO_HLSB, MONO_HMSB):
+        return bytearray(np.packbits(a, axis=1, bitorder='big' if format == MONO_HLSB else 'little').tobytes())
+    if format == MONO_VLSB:
+        pages = np.zeros(((height + 7) // 8 * 8, stride), dtype=np.uint8)
+        pages[:height] = a
+        pages = pages.reshape(-1, 8, stride)
+        return bytearray(np.packbits(pages, axis=1, bitorder='little').tobytes())
+    if format == GS4_HMSB:
+        a = a.reshape(height, stride // 2, 2)
+        return bytearray(((a[:, :, 0] << 4) | a[:, :, 1]).tobytes())
+    a = a.reshape(height, stride // 4, 4)
+    return bytearray((a[:, :, 0] | (a[:, :, 1] << 2) | (a[:, :, 2] << 4) | (a[:, :, 3] << 6)).tobytes())
+
+
+def _source(fbuf):
+    # pixels of blit source: NPFrameBuffer, FrameBuffer with buffer attributes
+    # (host/framebuf.py) or tuple (buffer, width, height, format[, stride])
+    if isinstance(fbuf, NPFrameBuffer):
+        return fbuf.pixels
+    if isinstance(fbuf, (tuple, list)):
+        return unpack(*fbuf)
+    return unpack(fbuf.buf, fbuf.width, fbuf.height, fbuf.format, fbuf.stride)
+
+
+class NPFrameBuffer(object):
+    def __init__(self, width, height, format=RGB565, buffer=None, stride=None):
+        '''
+        width, height, format - like FrameBuffer (framebuf constants)
+        buffer - optional initial content in FrameBuffer format
+        '''
+        _stride(width, format)
+        self.width = width
+        self.height = height
+        self.format = format
+        self.mask = _MASK[format]
+        if buffer is None:
+            self.pixels = np.zeros((height, width), dtype=np.uint16)
+        else:
+            self.pixels = unpack(buffer, width, height, format, stride)
+
+    def _c(self, c):
+        return (c != 0) if self.mask == 1 else c & self.mask
+
+    def _points(self, xs, ys, c):
+        # set pixels at arrays of coordinates, points outside are skipped
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        m = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        self.pixels[ys[m], xs[m]] = self._c(c)
+
+    def _spans(self, rows, x1, x2, c):
+        # fill spans x1..x2 (inclusive) of rows, by a difference array of clipped spans
+        rows = np.asarray(rows)
+        x1 = np.maximum(np.asarray(x1), 0)
+        x2 = np.minimum(np.asarray(x2) + 1, self.width)
+        m = (rows >= 0) & (rows < self.height) & (x1 < x2)
+        if not m.any():
+            return
+        rows = rows[m]
+        x1 = x1[m]
+        x2 = x2[m]
+        # only the bounding box of spans
+        r0 = rows.min()
+        c0 = x1.min()
+        c1 = x2.max()
+        d = np.zeros((rows.max() - r0 + 1, c1 - c0 + 1), dtype=np.int32)
+        np.add.at(d, (rows - r0, x1 - c0), 1)
+        np.add.at(d, (rows - r0, x2 - c0), -1)
+        area = self.pixels[r0:r0 + d.shape[0], c0:c1]
+        area[np.cumsum(d[:, :-1], axis=1) > 0] = self._c(c)
+
+    def fill(self, c):
+        self.pixels[:, :] = self._c(c)
+
+    def fill_rect(self, x, y, w, h, c):
+        if w < 1 or h < 1:
+            return
+        x1 = max(x, 0)
+        y1 = max(y, 0)
+        x2 = min(x + w, self.width)
+        y2 = min(y + h, self.height)
+        if x1 < x2 and y1 < y2:
+            self.pixels[y1:y2, x1:x2] = self._c(c)
+
+    def pixel(self, x, y, c=None):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            if c is None:
+                return int(self.pixels[y, x])
+            self.pixels[y, x] = self._c(c)
+        return None
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+        else:
+            self.fill_rect(x, y, w, 1, c)
+            self.fill_rect(x, y + h - 1, w, 1, c)
+            self.fill_rect(x, y, 1, h, c)
+            self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        # Bresenham of modframebuf.c, minor coordinate of step i is (2*dy*i + dx) // (2*dx)
+        dx = abs(x2 - x1)
+        dy = abs(y2 - y1)
+        sx = 1 if x2 > x1 else -1
+        sy = 1 if y2 > y1 else -1
+        steep = dy > dx
+        if steep:
+            x1, y1, dx, dy, sx, sy = y1, x1, dy, dx, sy, sx
+        i = np.arange(dx)
+        major = x1 + sx * i
+        minor = y1 + sy * ((2 * dy * i + dx) // (2 * dx)) if dx else i
+        if steep:
+            self._points(minor, major, c)
+        else:
+            self._points(major, minor, c)
+        self.pixel(x2, y2, c)
+
+    def ellipse(self, cx, cy, xr, yr, c, f=False, m=0xF):
+        if xr == 0 and yr == 0:
+            # the loops below would not end, single pixel like modframebuf.c
+            if m & 0xF:
+                self.pixel(cx, cy, c)
+            return
+        # points of the first quadrant by the algorithm of modframebuf.c
+        pts = []
+        two_asquare = 2 * xr * xr
+        two_bsquare = 2 * yr * yr
+        x = xr
+        y = 0
+        xchange = yr * yr * (1 - 2 * xr)
+        ychange = xr * xr
+        err = 0
+        stoppingx = two_bsquare * xr
+        stoppingy = 0
+        while stoppingx >= stoppingy:
+            pts.append((x, y))
+            y += 1
+            stoppingy += two_asquare
+            err += ychange
+            ychange += two_asquare
+            if (2 * err + xchange) > 0:
+                x -= 1
+                stoppingx -= two_bsquare
+                err += xchange
+                xchange += two_bsquare
+        x = 0
+        y = yr
+        xchange = yr * yr
+        ychange = xr * xr * (1 - 2 * yr)
+        err = 0
+        stoppingx = 0
+        stoppingy = two_asquare * yr
+        while stoppingx <= stoppingy:
+            pts.append((x, y))
+            x += 1
+            stoppingx += two_bsquare
+            err += xchange
+            xchange += two_bsquare
+            if (2 * err + ychange) > 0:
+                y -= 1
+                stoppingy -= two_asquare
+                err += ychange
+                ychange += two_asquare
+        px = np.array([p[0] for p in pts])
+        py = np.array([p[1] for p in pts])
+        # quadrants 1..4 (mask bits) as signs of x, y
+        for bit, qx, qy in ((1, 1, -1), (2, -1, -1), (4, -1, 1), (8, 1, 1)):
+            if not m & bit:
+                continue
+            if f:
+                edge = np.full_like(px, cx)
+                if qx > 0:
+                    self._spans(cy + qy * py, edge, cx + px, c)
+                else:
+                    self._spans(cy + qy * py, cx - px, edge, c)
+            else:
+                self._points(cx + qx * px, cy + qy * py, c)
+
+    def poly(self, x, y, coords, c, f=False):
+        n = len(coords) // 2
+        if n == 0:
+            return
+        cs = np.array(coords[:2 * n], dtype=np.int64)
+        # edges from vertex i to i-1 (as modframebuf.c walks them)
+        px1 = cs[0::2]
+        py1 = cs[1::2]
+        px2 = np.roll(px1, 1)
+        py2 = np.roll(py1, 1)
+        if not f:
+            for j in range(n):
+                self.line(x + int(px1[j]), y + int(py1[j]), x + int(px2[j]), y + int(py2[j]), c)
+            return
+        # end point at the bottom row of each edge, horizontal edges as lines
+        for j in range(n):
+            if py1[j] < py2[j]:
+                self.pixel(x + int(px2[j]), y + int(py2[j]), c)
+            elif py2[j] < py1[j]:
+                self.pixel(x + int(px1[j]), y + int(py1[j]), c)
+            else:
+                self.line(x + int(px1[j]), y + int(py1[j]), x + int(px2[j]), y + int(py2[j]), c)
+        # crossings of rows with edges, half-open in y
+        rows = []
+        nodes = []
+        for j in np.nonzero(py1 != py2)[0]:
+            r = np.arange(min(py1[j], py2[j]), max(py1[j], py2[j]))
+            rows.append(r)
+            nodes.append(_cdiv(32 * px1[j] + _cdiv(32 * (px2[j] - px1[j]) * (r - py1[j]), py2[j] - py1[j]) + 16, 32))
+        if not rows:
+            return
+        rows = np.concatenate(rows)
+        nodes = np.concatenate(nodes)
+        order = np.lexsort((nodes, rows))
+        rows = rows[order]
+        nodes = nodes[order]
+        # each row has even number of crossings, pairs are spans
+        self._spans(y + rows[0::2], x + nodes[0::2], x + nodes[1::2], c)
+
+    def scroll(self, xstep, ystep):
+        w = self.width
+        h = self.height
+        if abs(xstep) >= w or abs(ystep) >= h:
+            return
+        dx1, sx1 = (xstep, 0) if xstep >= 0 else (0, -xstep)
+        dy1, sy1 = (ystep, 0) if ystep >= 0 else (0, -ystep)
+        cw = w - abs(xstep)
+        ch = h - abs(ystep)
+        self.pixels[dy1:dy1 + ch, dx1:dx1 + cw] = self.pixels[sy1:sy1 + ch, sx1:sx1 + cw].copy()
+
+    def text(self, s, x, y, c=1):
+        for ch in s:
+            self.rect(x + 1, y + 1, 6, 6, c)
+            x += 8
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        src = _source(fbuf)
+        sh, sw = src.shape
+        if x >= self.width or y >= self.height or -x >= sw or -y >= sh:
+            return
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = max(0, -x)
+        y1 = max(0, -y)
+        w = min(self.width, x + sw) - x0
+        h = min(self.height, y + sh) - y0
+        col = src[y1:y1 + h, x1:x1 + w]
+        if palette is not None:
+            col = _source(palette)[0][col]
+        dst = self.pixels[y0:y0 + h, x0:x0 + w]
+        part = col & self.mask if self.mask != 1 else (col != 0)
+        if key == -1:
+            dst[:, :] = part
+        else:
+            sel = col != key
+            dst[sel] = part[sel]
+
+    # export
+    def buffer(self, stride=None):
+        '''
+        Content as FrameBuffer data (bytearray), e.g. to send to a device
+        '''
+        return pack(self.pixels, self.format, stride)
+
+    def rgb(self, palette=None):
+        '''
+        Image as array [height, width, 3] of 8 bit RGB.
+        palette - optional list of (r, g, b) indexed by pixel value, otherwise
+        RGB565 is expanded, gray formats are gray and 1 of mono formats is white
+        '''
+        p = self.pixels
+        if palette is not None:
+            return np.array(palette, dtype=np.uint8)[p]
+        if self.format == RGB565:
+            r = (p >> 11) & 0x1F
+            g = (p >> 5) & 0x3F
+            b = p & 0x1F
+            return np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=2).astype(np.uint8)
+        v = (p * (255 // self.mask)).astype(np.uint8)
+        return np.stack((v, v, v), axis=2)
+
+    def png(self, palette=None):
+        '''
+        Image as PNG file (bytes), 8 bit RGB
+        '''
+        rgb = self.rgb(palette)
+        raw = np.zeros((self.height, 1 + 3 * self.width), dtype=np.uint8)
+        raw[:, 1:] = rgb.reshape(self.height, -1)
+
+        def chunk(tag, data):
+            return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF)
+        return b'\x89PNG\r\n\x1a\n' + \
+            chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0)) + \
+            chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b'')
+
+    def bmp(self, palette=None):
+        '''
+        Image as 24bpp BMP file (bytes)
+        '''
+        stride = (3 * self.width + 3) & ~3
+        rows = np.zeros((self.height, stride), dtype=np.uint8)
+        rows[:, :3 * self.width] = self.rgb(palette)[::-1, :, ::-1].reshape(self.height, -1)
+        data = rows.tobytes()
+        return struct.pack('<HIHHIIiiHHIIiiII', 0x4D42, 54 + len(data), 0, 0, 54, 40,
+                           self.width, self.height, 1, 24, 0, len(data), 2835, 2835, 0, 0) + data
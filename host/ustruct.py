@@ -0,0 +1,5 @@
+'''
+Stand-in of the MicroPython "ustruct" module (struct of CPython)
+'''
+
+from struct import *